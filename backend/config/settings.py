@@ -55,7 +55,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware', # WhiteNoise
+    'mentor.middleware.AsyncWhiteNoiseMiddleware', # WhiteNoise (async-capable for config/asgi.py)
+    'mentor.middleware.APICompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -147,6 +148,101 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 GOOGLE_API_KEY = os.environ.get('GOOGLE_API_KEY')
 
+# 'gemini' calls the real API; 'fake' uses the offline stand-in (services/fake_gemini.py) for
+# load tests and CI. Its latency is 'fixed:S', 'uniform:MIN:MAX', 'normal:MEAN:STDDEV' or
+# 'lognormal:MEDIAN:SIGMA' seconds per call, streamed replies add AI_FAKE_CHUNK_LATENCY per
+# chunk of AI_FAKE_CHUNK_WORDS words, and AI_FAKE_ERROR_429/500 are the shares of calls that fail.
+AI_BACKEND = os.environ.get('AI_BACKEND', 'gemini')
+AI_FAKE_LATENCY = os.environ.get('AI_FAKE_LATENCY', 'lognormal:0.8:0.5')
+AI_FAKE_CHUNK_LATENCY = float(os.environ.get('AI_FAKE_CHUNK_LATENCY', '0.05'))
+AI_FAKE_CHUNK_WORDS = int(os.environ.get('AI_FAKE_CHUNK_WORDS', '4'))
+AI_FAKE_ERROR_429 = float(os.environ.get('AI_FAKE_ERROR_429', '0'))
+AI_FAKE_ERROR_500 = float(os.environ.get('AI_FAKE_ERROR_500', '0'))
+AI_FAKE_SEED = int(os.environ.get('AI_FAKE_SEED', '0'))
+
+# Cache for repeated Gemini prompts (CACHED_PROMPTS in services/ai_service.py: hints and error
+# explanations; homework verdicts and solutions are kept per task by services/homework_store.py).
+# Backend: 'local' (per-process LRU), 'django' (CACHES['default']), 'db' (shared table) or 'none'.
+AI_CACHE_BACKEND = os.environ.get('AI_CACHE_BACKEND', 'local')
+AI_CACHE_TTL = int(os.environ.get('AI_CACHE_TTL', str(7 * 24 * 3600)))
+AI_CACHE_MAX_ENTRIES = int(os.environ.get('AI_CACHE_MAX_ENTRIES', '2000'))
+
+# Gemini circuit breaker (services/model_health.py): a model is skipped for AI_MODEL_COOLDOWN
+# seconds (doubling up to AI_MODEL_MAX_COOLDOWN) after this many consecutive failures or one 429.
+AI_MODEL_FAILURE_THRESHOLD = int(os.environ.get('AI_MODEL_FAILURE_THRESHOLD', '3'))
+AI_MODEL_COOLDOWN = int(os.environ.get('AI_MODEL_COOLDOWN', '30'))
+AI_MODEL_MAX_COOLDOWN = int(os.environ.get('AI_MODEL_MAX_COOLDOWN', '600'))
+
+# Background jobs (services/jobs.py, run by `manage.py run_jobs`): a claimed job is hidden from
+# other workers for JOBS_VISIBILITY_TIMEOUT seconds; failed attempts retry after
+# JOBS_RETRY_BACKOFF * 2^(attempt-1) seconds. JOBS_INLINE runs jobs in the request instead.
+JOBS_VISIBILITY_TIMEOUT = int(os.environ.get('JOBS_VISIBILITY_TIMEOUT', '120'))
+JOBS_RETRY_BACKOFF = int(os.environ.get('JOBS_RETRY_BACKOFF', '10'))
+JOBS_INLINE = os.environ.get('JOBS_INLINE', 'False') == 'True'
+
+# Client-side Gemini rate limit (services/rate_limit.py): a token bucket of AI_RATE_LIMIT_BURST
+# calls refilled at AI_RATE_LIMIT_PER_MINUTE, shared by all workers ('db') or per process
+# ('local'); 'none' disables it. Interactive calls (chat, hints, homework checks) may use the
+# whole bucket, normal ones (feedback, reports) leave 20% and bulk ones (question generation,
+# chat summaries) leave 50% and are skipped or deferred instead of waiting.
+AI_RATE_LIMIT_BACKEND = os.environ.get('AI_RATE_LIMIT_BACKEND', 'db')
+AI_RATE_LIMIT_PER_MINUTE = float(os.environ.get('AI_RATE_LIMIT_PER_MINUTE', '60'))
+AI_RATE_LIMIT_BURST = float(os.environ.get('AI_RATE_LIMIT_BURST', '20'))
+
+# Independent AI calls made for one request run concurrently (services/fanout.py) on a
+# pool of AI_FANOUT_WORKERS threads, sharing one deadline of AI_FANOUT_DEADLINE seconds.
+AI_FANOUT_WORKERS = int(os.environ.get('AI_FANOUT_WORKERS', '8'))
+AI_FANOUT_DEADLINE = float(os.environ.get('AI_FANOUT_DEADLINE', '45'))
+
+# Time budget in seconds for each GeminiService method, covering every fallback model it
+# tries (services/deadline.py). Override one with AI_DEADLINE_<METHOD>, e.g. AI_DEADLINE_GENERATE_HINT=8.
+AI_DEADLINES = {
+    method: float(os.environ.get(f'AI_DEADLINE_{method.upper()}', seconds))
+    for method, seconds in {
+        'default': 30,
+        'get_feedback': 20,
+        'generate_homework': 20,
+        'test_followup': 20,  # get_feedback + generate_homework, run concurrently
+        'check_homework': 20,
+        'get_homework_solution': 30,
+        'generate_and_save_questions': 30,
+        'generate_hint': 10,
+        'explain_error': 15,
+        'mentor_chat': 25,
+        'summarize_chat': 30,
+        'generate_final_report': 40,
+    }.items()
+}
+
+# Token budgets for the variable parts (lesson text, code, history, error) of these prompts
+# (services/prompt_budget.py). Override one with AI_PROMPT_BUDGET_<METHOD>.
+AI_PROMPT_BUDGETS = {
+    method: int(os.environ.get(f'AI_PROMPT_BUDGET_{method.upper()}', tokens))
+    for method, tokens in {
+        'mentor_chat': 3000,
+        'generate_hint': 2000,
+        'explain_error': 2000,
+    }.items()
+}
+
+# Mentor chat prompts carry the session's rolling summary plus the messages not yet folded
+# into it. Once CHAT_HISTORY_TURNS + CHAT_SUMMARY_EVERY of those have piled up, a background
+# job folds all but the last CHAT_HISTORY_TURNS into the summary, so prompts stay bounded.
+CHAT_HISTORY_TURNS = int(os.environ.get('CHAT_HISTORY_TURNS', '8'))
+CHAT_SUMMARY_EVERY = int(os.environ.get('CHAT_SUMMARY_EVERY', '6'))
+
+# Seconds each process trusts its copy of the content version before re-reading it, so a
+# curriculum reload reaches other workers within this window. 0 re-reads on every lookup.
+CONTENT_VERSION_TTL = float(os.environ.get('CONTENT_VERSION_TTL', '5'))
+
+# Read course progress from the compact per-course bitmaps (mentor.CourseProgress)
+# instead of individual UserLessonProgress rows. The bitmaps are only kept in sync while
+# this is on: run `manage.py rebuild_course_progress` right after turning it on.
+PROGRESS_BITMAP_READS = os.environ.get('PROGRESS_BITMAP_READS', 'False') == 'True'
+
+# API responses at least this large are sent brotli/gzip-compressed when the client accepts it
+API_COMPRESSION_MIN_BYTES = int(os.environ.get('API_COMPRESSION_MIN_BYTES', '1024'))
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
@@ -161,6 +257,10 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'mentor.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
 # JWT Settings
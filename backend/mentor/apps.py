@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class MentorConfig(AppConfig):
     name = 'mentor'
+
+    def ready(self):
+        from . import signals, jobs  # noqa: F401
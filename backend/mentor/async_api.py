@@ -0,0 +1,40 @@
+from asgiref.sync import sync_to_async
+from rest_framework import views
+
+
+class AsyncAPIView(views.APIView):
+    """
+    APIView whose handlers are `async def`. DRF dispatches synchronously, so this
+    runs the usual authentication, permission and throttle checks in a worker
+    thread and awaits the handler on the event loop. Under config/asgi.py a
+    request waiting on Gemini then costs a coroutine instead of a worker; under
+    WSGI the view still works, Django runs it in a per-request event loop.
+
+    Handlers must use the async ORM (aget, acreate, `async for`, ...) or
+    sync_to_async for database work.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if hasattr(response, '__await__'):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def options(self, request, *args, **kwargs):
+        return super().options(request, *args, **kwargs)
@@ -0,0 +1,121 @@
+import random
+
+from django.conf import settings
+
+from mentor.models import ChatSession, Homework, TestResult
+from mentor.services.ai_service import get_gemini_service
+from mentor.services.deadline import Deadline, or_fallback
+from mentor.services.fanout import fan_out
+from mentor.services.jobs import job_handler
+
+
+@job_handler('test_followup')
+def test_followup(payload):
+    """AI feedback and homework for a submitted test; fills in its TestResult."""
+    result = TestResult.objects.select_related('user').get(id=payload['test_result_id'])
+    user, language, category = result.user, result.language, result.category
+    wrong_concepts = payload.get('wrong_concepts', [])
+    is_child = payload.get('is_child', False)
+
+    # Feedback and homework are independent: run them side by side under one deadline
+    ai = get_gemini_service()
+    deadline = Deadline.for_method('test_followup')
+    fan = fan_out({
+        'feedback': lambda: ai.get_feedback(
+            language=language,
+            category=category,
+            score=result.score,
+            total=result.total_questions,
+            wrong_answers=wrong_concepts[:5],
+            is_child=is_child,
+            deadline=deadline
+        ),
+        'homework': lambda: ai.generate_homework(language, category, wrong_concepts, is_child, deadline=deadline),
+    }, defaults={'feedback': "AI Mentor is currently offline, but great job!", 'homework': []})
+    ai_advice = or_fallback(fan.results['feedback'], "AI Mentor is currently offline, but great job!")
+    tasks = or_fallback(fan.results['homework'], [])
+
+    if not tasks:
+        tasks = fallback_tasks(language, result.level, is_child)
+
+    # Safe to re-run on retry: existing homework is not duplicated
+    for task_desc in tasks:
+        if not Homework.objects.filter(user=user, language=language, category=category, task_description=task_desc).exists():
+            Homework.objects.create(
+                user=user,
+                language=language,
+                category=category,
+                task_description=task_desc,
+                status='assigned'
+            )
+
+    result.ai_feedback = ai_advice
+    result.tasks = tasks
+    result.save(update_fields=['ai_feedback', 'tasks'])
+    return {"ai_feedback": ai_advice, "tasks": tasks}
+
+
+@job_handler('summarize_chat')
+def summarize_chat(payload):
+    """Folds a chat session's older messages into its rolling summary."""
+    session = ChatSession.objects.get(id=payload['session_id'])
+    pending = list(
+        session.messages.filter(id__gt=session.summarized_until).order_by('id').values('id', 'role', 'content')
+    )
+    to_fold = pending[:len(pending) - settings.CHAT_HISTORY_TURNS]
+    if not to_fold:
+        return {"folded": 0}
+
+    summary = get_gemini_service().summarize_chat(session.summary, to_fold)
+    if summary is None:
+        raise RuntimeError(f"Could not summarize chat session {session.id}")  # Retried with backoff
+
+    # A concurrent run that already moved the summary on wins; this one's work is dropped
+    updated = ChatSession.objects.filter(id=session.id, summarized_until=session.summarized_until).update(
+        summary=summary, summarized_until=to_fold[-1]['id']
+    )
+    return {"folded": len(to_fold) if updated else 0}
+
+
+def fallback_tasks(language, level, is_child):
+    """Homework from the built-in pool when AI generation is unavailable."""
+    # Basic task sets
+    all_tasks = {
+        'python': {
+            'beginner': ["Write a basic calculator", "Create a loop that prints prime numbers", "Build a guessing game", "List all files in a folder", "Calculate area of a circle"],
+            'junior': ["Build a web scraper with BeautifulSoup", "Create a simple CRUD with Flask", "Automate email sending", "Parse a CSV file", "Create a basic CLI tool"],
+            'strong_junior': ["Implement a decorator for logging", "Write unit tests for a library", "Design a simple API with Django", "Optimize a dictionary search", "Handle JSON data from an API"],
+            'middle': ["Design a microservice using FastAPI", "Optimize a slow SQL query with Django ORM", "Implement a custom caching layer", "Build a real-time notification system", "Architect a scalable backend"]
+        },
+        'javascript': {
+            'beginner': ["Create a To-Do list with vanilla JS", "Build a countdown timer", "Change background color on click", "Validate a simple form", "Create a digital clock"],
+            'junior': ["Fetch data from an API and display it", "Use localStorage to save user preferences", "Build a photo gallery", "Implement a search filter", "Create a toggle-able accordion"],
+            'strong_junior': ["Implement a custom React Hook", "Setup routing with React Router", "Build a state-managed store", "Handle async data with Redux", "Integrate a 3rd party library"],
+            'middle': ["Build a real-time chat with Socket.io", "Setup Next.js with SSR", "Optimize bundle size", "Implement advanced animations", "Architect an enterprise React app"]
+        },
+        'go': {
+            'beginner': ["Hello world with Go routines", "Write a program that reads a JPG", "Simple CLI flag parser", "Math operations", "String manipulation"],
+            'junior': ["Create a concurrent URL checker", "Build a REST API with Fiber", "Handle JSON files", "Simple TCP echo server", "File encryption tool"],
+            'middle': ["Implement a worker pool", "Design a CLI tool for file encryption", "Optimize memory usage", "Build a high-performance proxy", "Microservice communication"]
+        },
+        'java': {
+            'beginner': ["Inheritance example with Animals", "File IO basics", "Simple geometry shapes", "Calculator", "User Input handling"],
+            'junior': ["Spring Boot Hello World", "Connect to MySQL with JDBC", "Build a library manager", "HTTP Client example", "Unit testing with JUnit"],
+            'middle': ["Microservices with Spring Cloud", "JVM performance tuning basics", "Hibernate optimizations", "Multithreading systems", "Enterprise patterns"]
+        }
+    }
+    
+    lang_tasks = all_tasks.get(language, {})
+    level_tasks = lang_tasks.get(level, lang_tasks.get('junior', ["Explore the official documentation"]))
+    
+    # Enforce counts: 3 for kids, 5 for adults
+    count = 3 if is_child else 5
+    
+    # Use random.choices to allow repetitions if pool is small, preventing crashes
+    selected = random.choices(level_tasks, k=count)
+    
+    # Add friendly icons for kids
+    if is_child:
+        return [f"🌟 {task}" for task in selected]
+    
+    return selected
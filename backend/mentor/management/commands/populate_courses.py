@@ -1,5 +1,7 @@
 from django.core.management.base import BaseCommand
 from mentor.models import Course, Module, Lesson
+from mentor.services.content_version import bump_content_version
+from mentor.services.markdown_render import prerender_lessons
 # Import V2 data
 from mentor.content_data_v2 import BACKEND_COURSE_V2, FRONTEND_COURSE_V2
 
@@ -83,4 +85,7 @@ class Command(BaseCommand):
                     else:
                         Lesson.objects.create(module=module, slug=slug, **defaults)
         
-        self.stdout.write(self.style.SUCCESS('Successfully populated V2 courses.'))
+        rendered = prerender_lessons()
+        version = bump_content_version()
+        self.stdout.write(f"Pre-rendered HTML for {rendered} lessons.")
+        self.stdout.write(self.style.SUCCESS(f'Successfully populated V2 courses (content v{version}).'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from mentor.models import UserLessonProgress
+from mentor.services.progress_bitmap import ProgressBitmapStore
+
+class Command(BaseCommand):
+    help = 'Rebuilds the compact CourseProgress bitmaps from UserLessonProgress'
+
+    def handle(self, *args, **kwargs):
+        store = ProgressBitmapStore()
+        pairs = UserLessonProgress.objects.values_list('user_id', 'lesson__module__course_id').distinct()
+
+        count = 0
+        for user_id, course_id in pairs:
+            store.rebuild(user_id, course_id)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} course progress rows (content v{store.index.version}).'))
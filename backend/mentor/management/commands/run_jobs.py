@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from mentor.services.jobs import default_worker_id, work
+
+class Command(BaseCommand):
+    help = 'Runs background jobs from the DB queue (mentor.Job). Start as many workers as needed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the due jobs and exit')
+        parser.add_argument('--poll', type=float, default=2.0, help='Seconds between polls of an empty queue')
+        parser.add_argument('--worker-id', default=None)
+
+    def handle(self, *args, **options):
+        worker_id = options['worker_id'] or default_worker_id()
+        self.stdout.write(f'Job worker {worker_id} started.')
+        count = work(worker_id=worker_id, once=options['once'], poll_interval=options['poll'])
+        self.stdout.write(self.style.SUCCESS(f'Ran {count} jobs.'))
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mentor', '0012_contentversion_userlessonprogress_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('completed_bits', models.BinaryField(default=b'')),
+                ('unlocked_bits', models.BinaryField(default=b'')),
+                ('content_version', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mentor.course')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='course_progress', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'course')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CourseProgressAttempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('failed_attempts', models.PositiveIntegerField(default=0)),
+                ('course_progress', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempts', to='mentor.courseprogress')),
+                ('lesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mentor.lesson')),
+            ],
+            options={
+                'unique_together': {('course_progress', 'lesson')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mentor', '0014_lesson_prerendered_html'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AIResponseCacheEntry',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('method', models.CharField(max_length=50)),
+                ('text', models.TextField()),
+                ('expires_at', models.DateTimeField()),
+                ('last_used_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mentor', '0015_airesponsecacheentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HomeworkTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_hash', models.CharField(max_length=64, unique=True)),
+                ('language', models.CharField(max_length=20)),
+                ('task_description', models.TextField()),
+                ('reference_solution', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HomeworkVerdict',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('submission_hash', models.CharField(max_length=64)),
+                ('passed', models.BooleanField()),
+                ('feedback', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='verdicts', to='mentor.homeworktask')),
+            ],
+            options={
+                'unique_together': {('task', 'submission_hash')},
+            },
+        ),
+    ]
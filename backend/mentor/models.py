@@ -116,6 +116,29 @@ class Homework(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.language} - {self.category} ({self.status})"
 
+class HomeworkTask(models.Model):
+    # Content-addressed and shared by all users: one row per (language, normalized task text).
+    # Holds the AI answers for the task so identical homework never costs a second call.
+    task_hash = models.CharField(max_length=64, unique=True)
+    language = models.CharField(max_length=20)
+    task_description = models.TextField()
+    reference_solution = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.language} - {self.task_description[:50]}"
+
+class HomeworkVerdict(models.Model):
+    # AI check result for one (task, normalized submission) pair
+    task = models.ForeignKey(HomeworkTask, on_delete=models.CASCADE, related_name='verdicts')
+    submission_hash = models.CharField(max_length=64)
+    passed = models.BooleanField()
+    feedback = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('task', 'submission_hash')
+
 # --- NEW EDUCATIONAL CONTENT MODELS ---
 
 class Course(models.Model):
@@ -165,6 +188,11 @@ class Lesson(models.Model):
     content_en = models.TextField(help_text="Theory text or Task description (EN)", default='')
     content_ru = models.TextField(help_text="Theory text or Task description (RU)", default='')
     
+    # Sanitized HTML pre-rendered from the Markdown above by the curriculum loaders
+    content_html_en = models.TextField(blank=True, default='')
+    content_html_ru = models.TextField(blank=True, default='')
+    theory_steps_html = models.JSONField(default=list, blank=True) # [{"text_en": "<p>..</p>", "text_ru": "..."}]
+    
     # Practice Config
     initial_code = models.TextField(default="", blank=True)
     expected_output = models.TextField(blank=True, help_text="Simple match checks")
@@ -191,6 +219,14 @@ class Lesson(models.Model):
     def __str__(self):
         return f"[{self.lesson_type.upper()}] {self.title_en}"
 
+class ContentVersion(models.Model):
+    # Single row, bumped whenever the curriculum loaders rewrite course content
+    version = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Content v{self.version}"
+
 class UserLessonProgress(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='lesson_progress')
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE)
@@ -204,16 +240,48 @@ class UserLessonProgress(models.Model):
     step_progress = models.JSONField(default=dict, blank=True)
     
     completed_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True) # Progress revision for ETags
     
     class Meta:
         unique_together = ('user', 'lesson')
 
+class CourseProgress(models.Model):
+    # Compact mirror of a learner's UserLessonProgress rows for one course.
+    # Bit N of each bitset is the N-th lesson of the course in learning order
+    # (see services/lesson_index.py) at `content_version`; rows built under an
+    # older version are rebuilt from UserLessonProgress on access.
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='course_progress')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    completed_bits = models.BinaryField(default=b'')
+    unlocked_bits = models.BinaryField(default=b'')
+    content_version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'course')
+
+    def __str__(self):
+        return f"{self.user_id} - {self.course_id} (v{self.content_version})"
+
+class CourseProgressAttempt(models.Model):
+    # Side table for CourseProgress: only lessons with failed attempts get a row
+    course_progress = models.ForeignKey(CourseProgress, on_delete=models.CASCADE, related_name='attempts')
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE)
+    failed_attempts = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('course_progress', 'lesson')
+
 class ChatSession(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='chat_sessions')
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
+    # Rolling summary of the older messages (mentor/jobs.py: summarize_chat); prompts
+    # carry it plus the messages after summarized_until instead of the whole history
+    summary = models.TextField(blank=True)
+    summarized_until = models.BigIntegerField(default=0) # id of the last message folded into the summary
 
     def __str__(self):
         return f"Chat {self.id} - {self.user.username}"
@@ -231,6 +299,8 @@ class ChatMessage(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        # Serves "last N of a session" (prompt history) and the ?before=/?since= history pages
+        indexes = [models.Index(fields=['session', 'created_at'])]
 
     def __str__(self):
         return f"{self.role}: {self.content[:50]}"
@@ -245,3 +315,64 @@ class CourseReport(models.Model):
 
     def __str__(self):
         return f"Report for {self.user.username} - {self.course.slug}"
+
+class AIResponseCacheEntry(models.Model):
+    # Backing table for the 'db' AI response cache backend (services/ai_cache.py)
+    key = models.CharField(max_length=64, primary_key=True) # sha256 of method, template version, model, prompt
+    method = models.CharField(max_length=50)
+    text = models.TextField()
+    expires_at = models.DateTimeField()
+    last_used_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.method} {self.key[:12]}"
+
+class Job(models.Model):
+    # DB-backed background job queue (services/jobs.py), drained by `manage.py run_jobs`
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    kind = models.CharField(max_length=50)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name='jobs')
+    payload = models.JSONField(default=dict)
+    dedupe_key = models.CharField(max_length=255, unique=True, null=True, blank=True) # One job per key
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField() # Not picked up before this (retry backoff)
+    locked_until = models.DateTimeField(null=True, blank=True) # Visibility timeout of a running job
+    locked_by = models.CharField(max_length=100, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_after'])]
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} ({self.status})"
+
+
+class Lease(models.Model):
+    # Cross-worker mutex with expiry (services/singleflight.py); a crashed holder's lease just runs out
+    key = models.CharField(max_length=255, unique=True)
+    holder = models.CharField(max_length=100)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.key} held by {self.holder}"
+
+
+class RateBucket(models.Model):
+    # Token bucket shared by all workers (services/rate_limit.py); updated by compare-and-swap on version
+    name = models.CharField(max_length=50, unique=True)
+    tokens = models.FloatField()
+    refilled_at = models.FloatField() # Unix time the tokens were last brought up to date
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.tokens:.1f} tokens"
@@ -1,5 +1,38 @@
 from rest_framework import serializers
 from .models import Submission, AnalysisResult, Roadmap, ProjectRecommendation, TestQuestion, TestResult, Course, Module, Lesson, UserLessonProgress
+from .services.unlock import UnlockEngine, LessonState
+from .services.language import LANGUAGES, other_suffixes, slice_json
+from .services.markdown_render import lesson_html, lesson_steps_html
+
+class LanguageSliceMixin:
+    """
+    With context['lang'] set ('en' or 'ru') only that language is serialized:
+    `_xx` fields of the other language are dropped, compat fields (title,
+    description...) read the requested language, and JSON step/task lists are
+    sliced too. Without it both languages are sent as before.
+    """
+    json_content_fields = ()
+
+    def get_fields(self):
+        fields = super().get_fields()
+        lang = self.context.get('lang')
+        if lang:
+            suffixes = other_suffixes(lang)
+            for name in [n for n in fields if n.endswith(suffixes)]:
+                fields.pop(name)
+            for field in fields.values():
+                if field.source and field.source.endswith(suffixes):
+                    field.source = field.source[:-2] + lang
+        return fields
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        lang = self.context.get('lang')
+        if lang:
+            for name in self.json_content_fields:
+                if name in data:
+                    data[name] = slice_json(data[name], lang)
+        return data
 
 class AnalysisResultSerializer(serializers.ModelSerializer):
     class Meta:
@@ -24,7 +57,7 @@ class ProjectRecommendationSerializer(serializers.ModelSerializer):
         model = ProjectRecommendation
         fields = '__all__'
 
-class TestQuestionSerializer(serializers.ModelSerializer):
+class TestQuestionSerializer(LanguageSliceMixin, serializers.ModelSerializer):
     class Meta:
         model = TestQuestion
         fields = ('id', 'language', 'category', 'text_en', 'text_ru', 'options_en', 'options_ru', 'difficulty')
@@ -38,7 +71,7 @@ class TestResultSerializer(serializers.ModelSerializer):
 
 # --- COURSE SERIALIZERS ---
 
-class LessonSimpleSerializer(serializers.ModelSerializer):
+class LessonSimpleSerializer(LanguageSliceMixin, serializers.ModelSerializer):
     is_completed = serializers.SerializerMethodField()
     is_unlocked = serializers.SerializerMethodField()
     # Compat fields
@@ -48,12 +81,27 @@ class LessonSimpleSerializer(serializers.ModelSerializer):
         model = Lesson
         fields = ('id', 'slug', 'title', 'title_en', 'title_ru', 'order', 'lesson_type', 'is_completed', 'is_unlocked')
 
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.context.get('skeleton'):
+            # Shared course skeletons carry no per-user flags (see CourseSkeletonCache)
+            fields.pop('is_completed')
+            fields.pop('is_unlocked')
+        return fields
+
+    def _get_state(self, obj, user):
+        # Course tree responses pass precomputed states; single lessons compute their course once
+        states = self.context.get('lesson_states')
+        if states is None or obj.id not in states:
+            states = UnlockEngine.for_course(obj.module.course_id, user).states()
+            self.context['lesson_states'] = states
+        return states.get(obj.id, LessonState(False, False))
+
     def get_is_completed(self, obj):
         try:
             user = self.context.get('user')
             if user and user.is_authenticated:
-                progress = UserLessonProgress.objects.filter(user=user, lesson=obj).first()
-                return progress.is_completed if progress else False
+                return self._get_state(obj, user).is_completed
         except Exception as e:
             print(f"Error in get_is_completed: {e}")
         return False
@@ -63,32 +111,7 @@ class LessonSimpleSerializer(serializers.ModelSerializer):
             user = self.context.get('user')
             if not user or not user.is_authenticated:
                 return obj.order == 1
-            
-            progress = UserLessonProgress.objects.filter(user=user, lesson=obj).first()
-            if progress and progress.is_unlocked:
-                return True
-                
-            if obj.order == 1:
-                # First lesson in module - check if previous module is done
-                if obj.module.order == 1:
-                    return True  # First module, first lesson - always unlocked
-                    
-                prev_mod = Module.objects.filter(course=obj.module.course, order=obj.module.order - 1).first()
-                if not prev_mod:
-                    return True # First module of course
-                
-                last_lesson = prev_mod.lessons.order_by('-order').first()
-                if not last_lesson:
-                    return True
-                    
-                last_prog = UserLessonProgress.objects.filter(user=user, lesson=last_lesson).first()
-                return last_prog.is_completed if last_prog else False
-            
-            # Unlock logic: Prev lesson in module must be completed
-            prev_lesson = Lesson.objects.filter(module=obj.module, order=obj.order - 1).first()
-            if prev_lesson:
-                 prev_prog = UserLessonProgress.objects.filter(user=user, lesson=prev_lesson).first()
-                 return prev_prog.is_completed if prev_prog else False
+            return self._get_state(obj, user).is_unlocked
         except Exception as e:
             print(f"Error in get_is_unlocked: {e}")
                  
@@ -100,6 +123,7 @@ class LessonDetailSerializer(LessonSimpleSerializer):
     practice_task = serializers.SerializerMethodField()
     theory_ref_en = serializers.SerializerMethodField()
     theory_ref_ru = serializers.SerializerMethodField()
+    json_content_fields = ('theory_steps', 'practice_tasks')
     
     class Meta(LessonSimpleSerializer.Meta):
         fields = LessonSimpleSerializer.Meta.fields + (
@@ -110,25 +134,49 @@ class LessonDetailSerializer(LessonSimpleSerializer):
             'theory_ref_en', 'theory_ref_ru'
         )
 
+    def _as_html(self):
+        return self.context.get('content_format') == 'html'
+
+    def _content(self, obj, lang=None):
+        lang = lang or self.context.get('lang') or 'en'
+        if self._as_html():
+            return lesson_html(obj, lang)
+        return getattr(obj, f"content_{lang}")
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if self._as_html():
+            # ?content_format=html: same keys, pre-rendered sanitized HTML instead of Markdown
+            for lang in LANGUAGES:
+                if f'content_{lang}' in data:
+                    data[f'content_{lang}'] = self._content(instance, lang)
+            steps_html = lesson_steps_html(instance)
+            data['theory_steps'] = [
+                {**step, **{k: v for k, v in html_step.items() if k in step}}
+                for step, html_step in zip(data['theory_steps'], steps_html)
+            ]
+            data['content_format'] = 'html'
+        return data
+
     def get_theory_content(self, obj):
-        return obj.content_en if obj.lesson_type == 'theory' else ''
+        return self._content(obj) if obj.lesson_type == 'theory' else ''
 
     def get_practice_task(self, obj):
-        return obj.content_en if obj.lesson_type == 'practice' else ''
+        return self._content(obj) if obj.lesson_type == 'practice' else ''
 
     def get_theory_ref_en(self, obj):
         if obj.lesson_type == 'practice':
             prev = Lesson.objects.filter(module=obj.module, order=obj.order - 1, lesson_type='theory').first()
-            return prev.content_en if prev else ""
+            return self._content(prev, 'en') if prev else ""
         return ""
 
     def get_theory_ref_ru(self, obj):
         if obj.lesson_type == 'practice':
             prev = Lesson.objects.filter(module=obj.module, order=obj.order - 1, lesson_type='theory').first()
-            return prev.content_ru if prev else ""
+            return self._content(prev, 'ru') if prev else ""
         return ""
 
-class ModuleSerializer(serializers.ModelSerializer):
+class ModuleSerializer(LanguageSliceMixin, serializers.ModelSerializer):
     lessons = LessonSimpleSerializer(many=True, read_only=True)
     title = serializers.CharField(source='title_en', read_only=True)
     description = serializers.CharField(source='description_en', read_only=True)
@@ -137,7 +185,7 @@ class ModuleSerializer(serializers.ModelSerializer):
         model = Module
         fields = ('id', 'title', 'title_en', 'title_ru', 'order', 'description', 'description_en', 'description_ru', 'lessons')
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(LanguageSliceMixin, serializers.ModelSerializer):
     modules = ModuleSerializer(many=True, read_only=True)
     title = serializers.CharField(source='title_en', read_only=True)
     description = serializers.CharField(source='description_en', read_only=True)
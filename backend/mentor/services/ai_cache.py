@@ -0,0 +1,123 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+# Stand-in for a Gemini response on cache hits; callers only read `.text`
+CachedResponse = namedtuple('CachedResponse', ['text'])
+
+
+def normalize_prompt(prompt):
+    """
+    Drops line-ending and trailing-whitespace differences. Indentation is kept:
+    prompts embed learner code, where it is significant.
+    """
+    return '\n'.join(line.rstrip() for line in str(prompt).strip().splitlines())
+
+
+def prompt_key(method, version, model, prompt):
+    raw = f"{method}:v{version}:{model}:{normalize_prompt(prompt)}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class LocalResponseCache:
+    """Per-process LRU with TTL. The default backend."""
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, text = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return text
+
+    def set(self, key, text, method=None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DjangoResponseCache:
+    """Delegates to a configured Django cache (TTL and eviction are the cache's own)."""
+
+    def __init__(self, ttl, alias='default'):
+        self.ttl = ttl
+        self.cache = caches[alias]
+
+    def get(self, key):
+        return self.cache.get(f'ai:{key}')
+
+    def set(self, key, text, method=None):
+        self.cache.set(f'ai:{key}', text, self.ttl)
+
+    def clear(self):
+        self.cache.clear()
+
+
+class DBResponseCache:
+    """Shared across workers through the AIResponseCacheEntry table; evicts least recently used rows."""
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    def get(self, key):
+        from mentor.models import AIResponseCacheEntry
+
+        now = timezone.now()
+        entry = AIResponseCacheEntry.objects.filter(key=key, expires_at__gt=now).only('text').first()
+        if entry is None:
+            return None
+        AIResponseCacheEntry.objects.filter(key=key).update(last_used_at=now)
+        return entry.text
+
+    def set(self, key, text, method=None):
+        from mentor.models import AIResponseCacheEntry
+
+        now = timezone.now()
+        AIResponseCacheEntry.objects.update_or_create(
+            key=key,
+            defaults={'method': method or '', 'text': text, 'expires_at': now + timedelta(seconds=self.ttl), 'last_used_at': now}
+        )
+        AIResponseCacheEntry.objects.filter(expires_at__lte=now).delete()
+        stale = AIResponseCacheEntry.objects.order_by('-last_used_at').values_list('key', flat=True)[self.max_entries:]
+        AIResponseCacheEntry.objects.filter(key__in=list(stale)).delete()
+
+    def clear(self):
+        from mentor.models import AIResponseCacheEntry
+
+        AIResponseCacheEntry.objects.all().delete()
+
+
+def build_response_cache():
+    """Backend named by AI_CACHE_BACKEND: 'local', 'django', 'db', or 'none' to disable."""
+    backend = settings.AI_CACHE_BACKEND
+    ttl, max_entries = settings.AI_CACHE_TTL, settings.AI_CACHE_MAX_ENTRIES
+    if backend == 'local':
+        return LocalResponseCache(ttl, max_entries)
+    if backend == 'django':
+        return DjangoResponseCache(ttl)
+    if backend == 'db':
+        return DBResponseCache(ttl, max_entries)
+    return None
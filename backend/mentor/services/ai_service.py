@@ -1,86 +1,194 @@
+import asyncio
 import os
+import threading
+from asgiref.sync import sync_to_async
 from django.conf import settings
 
-try:
-    import google.generativeai as genai
-except ImportError:
-    genai = None
+from mentor.services.ai_cache import CachedResponse, build_response_cache, prompt_key
+from mentor.services.deadline import Deadline, DeadlineExceeded, TimedOut
+from mentor.services.homework_store import homework_store
+from mentor.services.model_health import NoHealthyModel, model_health
+from mentor.services.rate_limit import RateLimited, build_rate_limiter
+from mentor.services.prompt_budget import (
+    Section, code_window, error_line, fit_sections, keep_ends, keep_head, prompt_budget, recent_history
+)
+
+if settings.AI_BACKEND == 'fake':
+    from mentor.services import fake_gemini as genai
+else:
+    try:
+        import google.generativeai as genai
+    except ImportError:
+        genai = None
+
+# Tried in order by _generate_with_fallback (stable Flash first for better quotas)
+FALLBACK_MODELS = [
+    'gemini-flash-latest',
+    'gemini-2.0-flash',
+    'gemini-2.5-flash',
+    'gemini-2.5-pro',
+    'gemini-2.0-flash-001'
+]
+# Candidates for the default `model` handle
+PREFERRED_MODELS = ['gemini-1.5-flash-001', 'gemini-1.5-flash', 'gemini-pro']
+CHAT_MODEL = 'gemini-1.5-flash'
+# Methods whose answers are shared across users and safe to cache, with their prompt
+# template version. Bump a version when its template changes to drop old answers.
+# Homework checks and solutions are persisted per task instead (services/homework_store.py).
+CACHED_PROMPTS = {
+    'hint': 2,
+    'explain_error': 2,
+}
+
+
+def chunk_text(chunk):
+    """Text of a streamed chunk; chunks carrying only finish/safety metadata have none."""
+    try:
+        return chunk.text
+    except (ValueError, AttributeError):
+        return ''
+
 
 class GeminiService:
+    """
+    Thin wrapper around the Gemini SDK. Views share one instance per process via
+    get_gemini_service(): the SDK is configured once and GenerativeModel handles are
+    created on first use and reused across requests and threads.
+    """
+
     def __init__(self):
         self.api_key = os.environ.get("GOOGLE_API_KEY")
         if not self.api_key:
             # Fallback for local dev if not in env
             self.api_key = getattr(settings, 'GOOGLE_API_KEY', None)
-        
-        self.model = None
-        
+        if not self.api_key and settings.AI_BACKEND == 'fake':
+            self.api_key = 'offline'
+
+        self.configured = False
+        self._models = {}
+        self._lock = threading.Lock()
+        self.cache = build_response_cache()
+        self.rate_limiter = build_rate_limiter()
+
         if self.api_key and genai:
             try:
                 genai.configure(api_key=self.api_key)
-                
-                # Try to initialize with a list of preferred models
-                for model_name in ['gemini-1.5-flash-001', 'gemini-1.5-flash', 'gemini-pro']:
-                    try:
-                        self.model = genai.GenerativeModel(model_name)
-                        break 
-                    except:
-                        continue
-                
-                if not self.model:
-                     self.model = genai.GenerativeModel('gemini-pro')
+                self.configured = True
             except Exception as e:
                 print(f"Failed to configure Gemini: {e}")
-                self.model = None
-        else:
-            if not genai:
-                print("Warning: google-generativeai not installed.")
-            self.model = None
-
-    def _generate_with_fallback(self, prompt):
-        """Attempts to generate content using the current model, falling back if it fails."""
+        elif not genai:
+            print("Warning: google-generativeai not installed.")
+
+    def get_model(self, model_name):
+        """Cached GenerativeModel handle, created on first use."""
+        model = self._models.get(model_name)
+        if model is None:
+            with self._lock:
+                model = self._models.get(model_name)
+                if model is None:
+                    model = self._models[model_name] = genai.GenerativeModel(model_name)
+        return model
+
+    @property
+    def model(self):
+        if not self.configured:
+            return None
+        for model_name in PREFERRED_MODELS:
+            try:
+                return self.get_model(model_name)
+            except Exception:
+                continue
+        return None
+
+    def _generate_with_fallback(self, prompt, cache_as=None, deadline=None, priority='normal'):
+        """
+        Attempts to generate content using the current model, falling back if it fails.
+        cache_as: a CACHED_PROMPTS name to answer repeated prompts from the response cache.
+        deadline: Deadline for all attempts together; raises DeadlineExceeded once it runs out.
+        priority: rate limiter class ('interactive', 'normal', 'bulk'); bulk calls raise
+        RateLimited instead of waiting for quota.
+        """
+        deadline = deadline or Deadline.for_method('default')
         if not self.api_key:
             raise Exception("AI not initialized (API Key missing)")
-            
-        # List of models to try in order (Prioritize stable Flash for better quotas)
-        models_to_try = [
-            'gemini-flash-latest', 
-            'gemini-2.0-flash',
-            'gemini-2.5-flash',
-            'gemini-2.5-pro',
-            'gemini-2.0-flash-001'
-        ]
-        
+
+        key, cached = self._cached(prompt, cache_as)
+        if cached:
+            return cached
+
         last_error = None
-        import time
-        for model_name in models_to_try:
+        attempted = False
+        for model_name in FALLBACK_MODELS:
+            deadline.timeout()  # Raises DeadlineExceeded once the budget is spent
+            if not model_health.acquire(model_name):
+                continue  # Cooling down after failures or a 429; never wait in the request thread
+            attempted = True
+            timeout = self._throttle(model_name, priority, deadline)
             try:
-                model = genai.GenerativeModel(model_name)
-                response = model.generate_content(prompt)
+                model = self.get_model(model_name)
+                response = model.generate_content(prompt, request_options={'timeout': timeout})
+                model_health.record_success(model_name)
+                if key and model_name == FALLBACK_MODELS[0]:
+                    self._remember(key, response, cache_as)
                 return response
             except Exception as e:
                 last_error = e
-                # If quota error, wait a bit before trying next model
-                if "429" in str(e) or "Quota" in str(e):
-                    time.sleep(2)
+                model_health.record_failure(model_name, e, deadline.bounded(timeout))
                 print(f"Model {model_name} failed: {e}")
-                continue
-        
-        # If we get here, all models failed.
-        # Try to diagnose by listing available models
+
+        raise self._fallback_error(attempted, last_error, deadline)
+
+    def _throttle(self, model_name, priority, deadline):
+        """
+        Waits for a rate limiter token for a call model_health already granted and returns
+        the call's timeout. If no token comes (shed, or the deadline runs out) the grant is
+        released, so a half-open probe slot is not held for a call that never happened.
+        """
         try:
-            available = []
-            for m in genai.list_models():
-                if 'generateContent' in m.supported_generation_methods:
-                    available.append(m.name)
-            
-            error_msg = f"All models failed. Available models on server: {available}. Last error: {last_error}"
-            raise Exception(error_msg)
-        except Exception as diag_e:
-            # If diagnose fails (e.g. auth error), raise original
-            raise Exception(f"All models failed and could not list models ({diag_e}). Last error: {last_error}")
+            if self.rate_limiter:
+                self.rate_limiter.acquire(priority, deadline)
+            return deadline.timeout()
+        except BaseException:
+            model_health.release(model_name)
+            raise
+
+    async def _athrottle(self, model_name, priority, deadline):
+        try:
+            if self.rate_limiter:
+                await self.rate_limiter.aacquire(priority, deadline)
+            return deadline.timeout()
+        except BaseException:
+            model_health.release(model_name)
+            raise
+
+    def _cached(self, prompt, cache_as):
+        """
+        (cache key or None, CachedResponse on a hit or None). Entries are keyed by the
+        primary model and only answers it produced are stored, so a fallback model's
+        answer is never served in its name.
+        """
+        if not cache_as or self.cache is None:
+            return None, None
+        key = prompt_key(cache_as, CACHED_PROMPTS[cache_as], FALLBACK_MODELS[0], prompt)
+        text = self.cache.get(key)
+        return key, CachedResponse(text) if text is not None else None
+
+    def _fallback_error(self, attempted, last_error, deadline):
+        if deadline.expired:
+            return DeadlineExceeded(f"Deadline of {deadline.seconds}s exceeded. Last error: {last_error}")
+        if not attempted:
+            return NoHealthyModel(f"All models are cooling down: {model_health.snapshot()}")
+        return Exception(f"All models failed. Last error: {last_error}")
+
+    def _remember(self, key, response, method):
+        try:
+            if response.text:
+                self.cache.set(key, response.text, method)
+        except Exception as e:
+            print(f"Failed to cache {method} response: {e}")
 
-    def get_feedback(self, language, category, score, total, wrong_answers, is_child=False):
+    def get_feedback(self, language, category, score, total, wrong_answers, is_child=False, deadline=None):
+        deadline = deadline or Deadline.for_method('get_feedback')
         if not self.api_key:
             return "AI Mentor is currently unavailable (API Key missing)."
 
@@ -100,15 +208,18 @@ class GeminiService:
         """
 
         try:
-            response = self._generate_with_fallback(prompt)
+            response = self._generate_with_fallback(prompt, deadline=deadline, priority='normal')
             return response.text
+        except DeadlineExceeded:
+            return TimedOut('get_feedback', deadline.seconds)
         except Exception as e:
             error_str = str(e)
-            if "429" in error_str or "Quota" in error_str:
+            if "429" in error_str or "Quota" in error_str or isinstance(e, (NoHealthyModel, RateLimited)):
                 return "ИИ устал и отдыхает (Лимит запросов исчерпан). Попробуйте через минуту!"
             return f"Ошибка ИИ: {error_str}"
 
-    def generate_homework(self, language, category, wrong_concepts=[], is_child=False):
+    def generate_homework(self, language, category, wrong_concepts=[], is_child=False, deadline=None):
+        deadline = deadline or Deadline.for_method('generate_homework')
         if not self.api_key:
             return ["Реализуйте простую программу на выбранном языке."]
 
@@ -137,20 +248,19 @@ class GeminiService:
         """
 
         try:
-            response = self._generate_with_fallback(prompt)
+            response = self._generate_with_fallback(prompt, deadline=deadline, priority='normal')
             import json
             clean_text = response.text.strip().replace("```json", "").replace("```", "").strip()
             tasks = json.loads(clean_text)
             if isinstance(tasks, str): return [tasks]
             return tasks
+        except DeadlineExceeded:
+            return TimedOut('generate_homework', deadline.seconds)
         except Exception as e:
             return [f"Напишите программу, использующую концепции {category}."]
 
-    def check_homework(self, language, task, submission):
-        if not self.api_key:
-            return True, "API Key missing, automatically passed."
-
-        prompt = f"""
+    def _check_homework_prompt(self, language, task, submission):
+        return f"""
         You are an IT Mentor. A student submitted code for this task:
         "{task}"
         
@@ -169,21 +279,42 @@ class GeminiService:
         [Feedback text]
         """
 
+    def _parse_verdict(self, text):
+        passed = text.strip().startswith("PASSED")
+        feedback = text.replace("PASSED", "").replace("FAILED", "").strip()
+        return passed, feedback
+
+    def check_homework(self, language, task, submission, deadline=None):
+        deadline = deadline or Deadline.for_method('check_homework')
+        if not self.api_key:
+            return True, "API Key missing, automatically passed."
+
+        stored = homework_store.verdict(language, task, submission)
+        if stored:
+            return stored
+
+        prompt = self._check_homework_prompt(language, task, submission)
+
         try:
-            response = self._generate_with_fallback(prompt)
-            text = response.text
-            passed = text.strip().startswith("PASSED")
-            feedback = text.replace("PASSED", "").replace("FAILED", "").strip()
+            response = self._generate_with_fallback(prompt, deadline=deadline, priority='interactive')
+            passed, feedback = self._parse_verdict(response.text)
+            homework_store.save_verdict(language, task, submission, passed, feedback)
             return passed, feedback
+        except DeadlineExceeded:
+            return TimedOut('check_homework', deadline.seconds)
         except Exception as e:
             return False, f"Ошибка проверки: {str(e)}"
 
-    def generate_and_save_questions(self, language, category, count=5):
+    def generate_questions(self, language, category, count=5, deadline=None, priority='bulk'):
+        """
+        Multiple choice questions as parsed JSON dicts (text_*, options_*, correct_option,
+        difficulty). Raises like _generate_with_fallback, or ValueError on a malformed answer.
+        """
+        deadline = deadline or Deadline.for_method('generate_and_save_questions')
         if not self.api_key:
-            return []
+            raise Exception("AI not initialized (API Key missing)")
 
         import json
-        from mentor.models import TestQuestion
 
         prompt = f"""
         Generate {count} unique multiple choice questions for {language} learners on theme '{category}'.
@@ -200,10 +331,26 @@ class GeminiService:
         ]
         """
 
+        response = self._generate_with_fallback(prompt, deadline=deadline, priority=priority)
+        clean_text = response.text.strip().replace("```json", "").replace("```", "").strip()
+        data = json.loads(clean_text)
+        if not isinstance(data, list):
+            raise ValueError("Expected a JSON list of questions")
+        return data
+
+    def generate_and_save_questions(self, language, category, count=5, deadline=None, priority='bulk'):
+        """
+        priority: 'bulk' for pool top-ups, which are shed under load; 'normal' when a
+        user is waiting on an empty pool.
+        """
+        deadline = deadline or Deadline.for_method('generate_and_save_questions')
+        if not self.api_key:
+            return []
+
+        from mentor.models import TestQuestion
+
         try:
-            response = self._generate_with_fallback(prompt)
-            clean_text = response.text.strip().replace("```json", "").replace("```", "").strip()
-            data = json.loads(clean_text)
+            data = self.generate_questions(language, category, count, deadline=deadline, priority=priority)
             
             new_questions = []
             for item in data:
@@ -219,15 +366,14 @@ class GeminiService:
                 )
                 new_questions.append(q)
             return new_questions
+        except DeadlineExceeded:
+            return TimedOut('generate_and_save_questions', deadline.seconds)
         except Exception as e:
             print(f"Failed to generate questions: {e}")
             return []
 
-    def get_homework_solution(self, language, task):
-        if not self.api_key:
-            return "Решение временно недоступно."
-
-        prompt = f"""
+    def _homework_solution_prompt(self, language, task):
+        return f"""
         You are an IT Mentor. A student failed to solve this task 3 times:
         "{task}"
         
@@ -241,17 +387,33 @@ class GeminiService:
         Language of response: Russian.
         """
 
+    def get_homework_solution(self, language, task, deadline=None):
+        deadline = deadline or Deadline.for_method('get_homework_solution')
+        if not self.api_key:
+            return "Решение временно недоступно."
+
+        stored = homework_store.solution(language, task)
+        if stored:
+            return stored
+
+        prompt = self._homework_solution_prompt(language, task)
+
         try:
-            response = self._generate_with_fallback(prompt)
+            response = self._generate_with_fallback(prompt, deadline=deadline, priority='normal')
+            homework_store.save_solution(language, task, response.text)
             return response.text
+        except DeadlineExceeded:
+            return TimedOut('get_homework_solution', deadline.seconds)
         except Exception as e:
             return f"Не удалось получить решение: {str(e)}"
 
-    def generate_hint(self, language, task, code):
-        if not self.api_key:
-            return "Hint unavailable (No API Key)."
-
-        prompt = f"""
+    def _hint_prompt(self, language, task, code, cursor_line=None):
+        fitted = fit_sections([
+            Section('code', code, 2, lambda code, tokens: code_window(code, tokens, cursor_line), cap=0.7),
+            Section('task', task, 1, keep_head, cap=0.5),
+        ], prompt_budget('generate_hint'))
+        task, code = fitted['task'], fitted['code']
+        return f"""
         You are a helpful IT Mentor. A student is stuck on this task:
         "{task}"
 
@@ -269,17 +431,30 @@ class GeminiService:
         
         Response Language: Russian.
         """
+
+    def generate_hint(self, language, task, code, deadline=None, cursor_line=None):
+        deadline = deadline or Deadline.for_method('generate_hint')
+        if not self.api_key:
+            return "Hint unavailable (No API Key)."
+
+        prompt = self._hint_prompt(language, task, code, cursor_line)
         try:
-           response = self._generate_with_fallback(prompt)
+           response = self._generate_with_fallback(prompt, cache_as='hint', deadline=deadline, priority='interactive')
            return response.text
+        except DeadlineExceeded:
+            return TimedOut('generate_hint', deadline.seconds)
         except Exception as e:
             return f"Hint failed: {e}"
 
-    def explain_error(self, language, task, code, error_message):
-        if not self.api_key:
-            return "Explanation unavailable."
-            
-        prompt = f"""
+    def _explain_error_prompt(self, language, task, code, error_message):
+        line = error_line(error_message)
+        fitted = fit_sections([
+            Section('error', error_message, 3, keep_ends, cap=0.3),
+            Section('code', code, 2, lambda code, tokens: code_window(code, tokens, line), cap=0.6),
+            Section('task', task, 1, keep_head, cap=0.4),
+        ], prompt_budget('explain_error'))
+        task, code, error_message = fitted['task'], fitted['code'], fitted['error']
+        return f"""
         You are a Code Doctor. A student got an error.
         Task: "{task}"
         
@@ -299,32 +474,51 @@ class GeminiService:
         
         Response Language: Russian.
         """
+
+    def explain_error(self, language, task, code, error_message, deadline=None):
+        deadline = deadline or Deadline.for_method('explain_error')
+        if not self.api_key:
+            return "Explanation unavailable."
+            
+        prompt = self._explain_error_prompt(language, task, code, error_message)
         try:
-            response = self._generate_with_fallback(prompt)
+            response = self._generate_with_fallback(prompt, cache_as='explain_error', deadline=deadline, priority='interactive')
             return response.text
+        except DeadlineExceeded:
+            return TimedOut('explain_error', deadline.seconds)
         except Exception as e:
             return f"Error explanation failed: {e}"
 
-    def mentor_chat(self, history, message, context_info, is_child=False):
+    def _chat_prompts(self, history, message, context_info, is_child):
         """
-        history: list of {"role": "user/mentor", "content": "..."}
-        message: newest user message
-        context_info: dict with {lesson_title, lesson_content, user_code, language}
+        (gemini_history, chat message, single-shot fallback prompt) for mentor_chat.
+        Lesson text, code, history and the message share the mentor_chat token budget;
+        the lesson text gives way first, then older history, then code far from the cursor.
         """
-        if not self.api_key:
-            return "Mentor chat is offline."
+        cursor_line = context_info.get('cursor_line')
+        fitted = fit_sections([
+            Section('message', message, 5, keep_head, cap=0.25),
+            Section('code', context_info.get('user_code') or '', 4,
+                    lambda code, tokens: code_window(code, tokens, cursor_line), cap=0.4),
+            Section('history', history, 3, recent_history, cap=0.35),
+            Section('summary', context_info.get('conversation_summary') or '', 2, keep_head, cap=0.15),
+            Section('lesson', context_info.get('lesson_content') or '', 1, keep_head, cap=0.3),
+        ], prompt_budget('mentor_chat'))
+        history, message = fitted['history'], fitted['message']
 
         # Format context
         ctx = f"""
         Context:
         Language: {context_info.get('language')}
         Lesson: {context_info.get('lesson_title')}
-        Topic Content: {context_info.get('lesson_content')}
+        Topic Content: {fitted['lesson']}
         Student's Current Code:
         ```
-        {context_info.get('user_code')}
+        {fitted['code']}
         ```
         """
+        if fitted['summary']:
+            ctx += f"\nEarlier in this conversation (summary):\n{fitted['summary']}\n"
 
         persona = "You are a friendly, encouraging AI programming tutor for children. Use emojis, keep it simple, and motivate them!" if is_child else \
                   "You are a professional IT Mentor. Provide deep technical insights, encourage best practices, and be concise."
@@ -346,27 +540,83 @@ class GeminiService:
         3. If they ask something irrelevant to programming, politely lead them back to the lesson.
         4. Response Language: Russian.
         """
+        transcript = '\n'.join(f"{'User' if h['role'] == 'user' else 'Assistant'}: {h['content']}" for h in history)
+        full_prompt = f"{persona}\n{ctx}\nHistory:\n{transcript}\nUser: {message}\nAssistant:"
+        return gemini_history, f"{prompt}\n\nUser: {message}", full_prompt
+
+    def mentor_chat(self, history, message, context_info, is_child=False, deadline=None):
+        """
+        history: list of {"role": "user/mentor", "content": "..."}
+        message: newest user message
+        context_info: dict with {lesson_title, lesson_content, user_code, language}
+        deadline: Deadline for the chat call and its fallback together
+        """
+        deadline = deadline or Deadline.for_method('mentor_chat')
+        if not self.api_key:
+            return "Mentor chat is offline."
+
+        gemini_history, chat_message, full_prompt = self._chat_prompts(history, message, context_info, is_child)
 
         try:
             # We use the model's start_chat if available or just generate with history
-            model_name = 'gemini-1.5-flash' # Using a specific good model for chat
-            model = genai.GenerativeModel(model_name)
-            
-            chat = model.start_chat(history=gemini_history)
-            response = chat.send_message(f"{prompt}\n\nUser: {message}")
+            deadline.timeout()  # Raises DeadlineExceeded once the budget is spent
+            if not model_health.acquire(CHAT_MODEL):
+                raise NoHealthyModel(f"{CHAT_MODEL} is cooling down")
+            timeout = self._throttle(CHAT_MODEL, 'interactive', deadline)
+            # Everything after the grant reports back to model_health, or a half-open probe leaks
+            try:
+                model = self.get_model(CHAT_MODEL)  # Using a specific good model for chat
+                chat = model.start_chat(history=gemini_history)
+                response = chat.send_message(chat_message, request_options={'timeout': timeout})
+            except Exception as e:
+                model_health.record_failure(CHAT_MODEL, e, deadline.bounded(timeout))
+                raise
+            model_health.record_success(CHAT_MODEL)
             return response.text
         except Exception as e:
             # Fallback to simple generation if chat fails
-            full_prompt = f"{persona}\n{ctx}\nHistory: {history}\nUser: {message}\nAssistant:"
             try:
-                resp = self._generate_with_fallback(full_prompt)
+                resp = self._generate_with_fallback(full_prompt, deadline=deadline, priority='interactive')
                 return resp.text
+            except DeadlineExceeded:
+                return TimedOut('mentor_chat', deadline.seconds)
             except:
                 return f"Chat error: {str(e)}"
 
-    def generate_final_report(self, context, lang='en'):
-        """Generates a detailed student progress report and path to Middle level."""
-        prompt = f"""
+    def _summary_prompt(self, summary, messages):
+        transcript = '\n'.join(f"{'Student' if m['role'] == 'user' else 'Mentor'}: {m['content']}" for m in messages)
+        return f"""
+        You maintain a running summary of a tutoring chat between a student and an IT Mentor.
+
+        Current summary:
+        {summary or '(empty)'}
+
+        New messages:
+        {transcript}
+
+        Task: Rewrite the summary so it also covers the new messages. Keep what the student
+        is working on, what they already understood, open questions and code issues discussed.
+        Max 150 words. Plain text, same language as the conversation.
+        """
+
+    def summarize_chat(self, summary, messages, deadline=None):
+        """
+        The rolling summary with `messages` ({"role", "content"}) folded in, or None if it
+        could not be produced (the caller keeps the old summary and tries again later).
+        """
+        deadline = deadline or Deadline.for_method('summarize_chat')
+        if not self.api_key or not messages:
+            return None
+        try:
+            prompt = self._summary_prompt(summary, messages)
+            response = self._generate_with_fallback(prompt, deadline=deadline, priority='bulk')
+            return response.text.strip() or None
+        except Exception as e:
+            print(f"Failed to summarize chat: {e}")
+            return None
+
+    def _final_report_prompt(self, context, lang):
+        return f"""
         ACT AS A SENIOR PROGRAMMING MENTOR.
         User has finished the course: {context['course']}.
         Completion: {context['completion']}.
@@ -391,8 +641,236 @@ class GeminiService:
         
         Response MUST be in Russian.
         """
+
+    def generate_final_report(self, context, lang='en', deadline=None):
+        """Generates a detailed student progress report and path to Middle level."""
+        deadline = deadline or Deadline.for_method('generate_final_report')
+        prompt = self._final_report_prompt(context, lang)
         try:
-            response = self._generate_with_fallback(prompt)
+            response = self._generate_with_fallback(prompt, deadline=deadline, priority='normal')
             return response.text
+        except DeadlineExceeded:
+            return TimedOut('generate_final_report', deadline.seconds)
         except Exception as e:
             return f"Error generating report: {str(e)}"
+
+    # --- Async variants for the async views ---
+    # Same prompts, fallbacks, caches and model health as the sync methods, but the
+    # Gemini round trip uses the SDK's *_async calls and never holds a thread.
+
+    async def _agenerate_with_fallback(self, prompt, cache_as=None, deadline=None, priority='normal'):
+        deadline = deadline or Deadline.for_method('default')
+        if not self.api_key:
+            raise Exception("AI not initialized (API Key missing)")
+
+        key, cached = await sync_to_async(self._cached)(prompt, cache_as)
+        if cached:
+            return cached
+
+        last_error = None
+        attempted = False
+        for model_name in FALLBACK_MODELS:
+            deadline.timeout()  # Raises DeadlineExceeded once the budget is spent
+            if not model_health.acquire(model_name):
+                continue
+            attempted = True
+            timeout = await self._athrottle(model_name, priority, deadline)
+            try:
+                response = await asyncio.wait_for(
+                    self.get_model(model_name).generate_content_async(prompt, request_options={'timeout': timeout}),
+                    timeout
+                )
+                model_health.record_success(model_name)
+                if key and model_name == FALLBACK_MODELS[0]:
+                    await sync_to_async(self._remember)(key, response, cache_as)
+                return response
+            except Exception as e:
+                last_error = e
+                model_health.record_failure(model_name, e, deadline.bounded(timeout))
+                print(f"Model {model_name} failed: {e}")
+
+        raise self._fallback_error(attempted, last_error, deadline)
+
+    async def acheck_homework(self, language, task, submission, deadline=None):
+        deadline = deadline or Deadline.for_method('check_homework')
+        if not self.api_key:
+            return True, "API Key missing, automatically passed."
+
+        stored = await sync_to_async(homework_store.verdict)(language, task, submission)
+        if stored:
+            return stored
+
+        try:
+            prompt = self._check_homework_prompt(language, task, submission)
+            response = await self._agenerate_with_fallback(prompt, deadline=deadline, priority='interactive')
+            passed, feedback = self._parse_verdict(response.text)
+            await sync_to_async(homework_store.save_verdict)(language, task, submission, passed, feedback)
+            return passed, feedback
+        except DeadlineExceeded:
+            return TimedOut('check_homework', deadline.seconds)
+        except Exception as e:
+            return False, f"Ошибка проверки: {str(e)}"
+
+    async def aget_homework_solution(self, language, task, deadline=None):
+        deadline = deadline or Deadline.for_method('get_homework_solution')
+        if not self.api_key:
+            return "Решение временно недоступно."
+
+        stored = await sync_to_async(homework_store.solution)(language, task)
+        if stored:
+            return stored
+
+        try:
+            prompt = self._homework_solution_prompt(language, task)
+            response = await self._agenerate_with_fallback(prompt, deadline=deadline, priority='normal')
+            await sync_to_async(homework_store.save_solution)(language, task, response.text)
+            return response.text
+        except DeadlineExceeded:
+            return TimedOut('get_homework_solution', deadline.seconds)
+        except Exception as e:
+            return f"Не удалось получить решение: {str(e)}"
+
+    async def agenerate_hint(self, language, task, code, deadline=None, cursor_line=None):
+        deadline = deadline or Deadline.for_method('generate_hint')
+        if not self.api_key:
+            return "Hint unavailable (No API Key)."
+
+        try:
+            prompt = self._hint_prompt(language, task, code, cursor_line)
+            response = await self._agenerate_with_fallback(prompt, cache_as='hint', deadline=deadline, priority='interactive')
+            return response.text
+        except DeadlineExceeded:
+            return TimedOut('generate_hint', deadline.seconds)
+        except Exception as e:
+            return f"Hint failed: {e}"
+
+    async def aexplain_error(self, language, task, code, error_message, deadline=None):
+        deadline = deadline or Deadline.for_method('explain_error')
+        if not self.api_key:
+            return "Explanation unavailable."
+
+        try:
+            prompt = self._explain_error_prompt(language, task, code, error_message)
+            response = await self._agenerate_with_fallback(prompt, cache_as='explain_error', deadline=deadline, priority='interactive')
+            return response.text
+        except DeadlineExceeded:
+            return TimedOut('explain_error', deadline.seconds)
+        except Exception as e:
+            return f"Error explanation failed: {e}"
+
+    async def amentor_chat(self, history, message, context_info, is_child=False, deadline=None):
+        deadline = deadline or Deadline.for_method('mentor_chat')
+        if not self.api_key:
+            return "Mentor chat is offline."
+
+        gemini_history, chat_message, full_prompt = self._chat_prompts(history, message, context_info, is_child)
+
+        try:
+            deadline.timeout()  # Raises DeadlineExceeded once the budget is spent
+            if not model_health.acquire(CHAT_MODEL):
+                raise NoHealthyModel(f"{CHAT_MODEL} is cooling down")
+            timeout = await self._athrottle(CHAT_MODEL, 'interactive', deadline)
+            try:
+                chat = self.get_model(CHAT_MODEL).start_chat(history=gemini_history)
+                response = await asyncio.wait_for(
+                    chat.send_message_async(chat_message, request_options={'timeout': timeout}),
+                    timeout
+                )
+            except Exception as e:
+                model_health.record_failure(CHAT_MODEL, e, deadline.bounded(timeout))
+                raise
+            except BaseException:
+                model_health.release(CHAT_MODEL)  # Request cancelled: says nothing about the model
+                raise
+            model_health.record_success(CHAT_MODEL)
+            return response.text
+        except Exception as e:
+            try:
+                resp = await self._agenerate_with_fallback(full_prompt, deadline=deadline, priority='interactive')
+                return resp.text
+            except DeadlineExceeded:
+                return TimedOut('mentor_chat', deadline.seconds)
+            except:
+                return f"Chat error: {str(e)}"
+
+    async def astream_mentor_chat(self, history, message, context_info, is_child=False, deadline=None):
+        """
+        amentor_chat as an async iterator of text chunks, forwarded as Gemini produces them.
+        Yields a single TimedOut instead if the deadline runs out before any text arrived;
+        a stream cut off by the deadline just ends.
+        """
+        deadline = deadline or Deadline.for_method('mentor_chat')
+        if not self.api_key:
+            yield "Mentor chat is offline."
+            return
+
+        gemini_history, chat_message, full_prompt = self._chat_prompts(history, message, context_info, is_child)
+
+        started = False
+        try:
+            deadline.timeout()  # Raises DeadlineExceeded once the budget is spent
+            if not model_health.acquire(CHAT_MODEL):
+                raise NoHealthyModel(f"{CHAT_MODEL} is cooling down")
+            timeout = await self._athrottle(CHAT_MODEL, 'interactive', deadline)
+            try:
+                chat = self.get_model(CHAT_MODEL).start_chat(history=gemini_history)
+                response = await asyncio.wait_for(
+                    chat.send_message_async(
+                        chat_message, stream=True, request_options={'timeout': timeout}
+                    ),
+                    timeout
+                )
+                chunks = response.__aiter__()
+                while True:
+                    timeout = deadline.remaining()
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout)
+                    except StopAsyncIteration:
+                        break
+                    text = chunk_text(chunk)
+                    if text:
+                        started = True
+                        yield text
+            except Exception as e:
+                model_health.record_failure(CHAT_MODEL, e, deadline.bounded(timeout))
+                raise
+            except BaseException:
+                model_health.release(CHAT_MODEL)  # Client went away or request cancelled
+                raise
+            model_health.record_success(CHAT_MODEL)
+        except Exception as e:
+            if started:
+                # Part of the answer is already on the client; keep it rather than restart
+                print(f"Chat stream interrupted: {e}")
+                return
+            try:
+                resp = await self._agenerate_with_fallback(full_prompt, deadline=deadline, priority='interactive')
+                yield resp.text
+            except DeadlineExceeded:
+                yield TimedOut('mentor_chat', deadline.seconds)
+            except:
+                yield f"Chat error: {str(e)}"
+
+    async def agenerate_final_report(self, context, lang='en', deadline=None):
+        deadline = deadline or Deadline.for_method('generate_final_report')
+        try:
+            prompt = self._final_report_prompt(context, lang)
+            response = await self._agenerate_with_fallback(prompt, deadline=deadline, priority='normal')
+            return response.text
+        except DeadlineExceeded:
+            return TimedOut('generate_final_report', deadline.seconds)
+        except Exception as e:
+            return f"Error generating report: {str(e)}"
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_gemini_service():
+    """Process-wide GeminiService shared by all views and threads."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = GeminiService()
+    return _service
@@ -0,0 +1,123 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count, F, Max
+
+from mentor.models import ContentVersion, UserLessonProgress
+
+
+_version_lock = threading.Lock()
+_version_seen = {'version': None, 'checked_at': 0.0}
+
+
+def read_content_version():
+    """The content version as stored in the database (always one query)."""
+    row = ContentVersion.objects.filter(pk=1).values_list('version', flat=True).first()
+    return row or 0
+
+
+def get_content_version():
+    """
+    The content version, re-read from the database at most once every
+    CONTENT_VERSION_TTL seconds per process, so hot paths (navigation, unlock
+    state, cached lesson payloads) don't pay a query per call.
+    """
+    ttl = getattr(settings, 'CONTENT_VERSION_TTL', 5)
+    now = time.monotonic()
+    with _version_lock:
+        if _version_seen['version'] is not None and now - _version_seen['checked_at'] < ttl:
+            return _version_seen['version']
+    version = read_content_version()
+    with _version_lock:
+        _version_seen['version'] = version
+        _version_seen['checked_at'] = now
+    return version
+
+
+def forget_content_version():
+    """Drops the per-process copy so the next get_content_version() reads the database."""
+    with _version_lock:
+        _version_seen['version'] = None
+
+
+def bump_content_version():
+    """Called by the curriculum loaders after they rewrite courses/modules/lessons."""
+    updated = ContentVersion.objects.filter(pk=1).update(version=F('version') + 1)
+    if not updated:
+        ContentVersion.objects.get_or_create(pk=1)
+    forget_content_version()
+    return get_content_version()
+
+
+def bitmap_reads_enabled():
+    return getattr(settings, 'PROGRESS_BITMAP_READS', False)
+
+
+def progress_revision(user, course_slug=None, rows=None):
+    """
+    Changes whenever one of the user's lesson progress rows is created, updated or
+    deleted. Pass already loaded `rows` to compute it without a query.
+    """
+    if not user or not user.is_authenticated:
+        return 'anon'
+    if rows is None and bitmap_reads_enabled():
+        from mentor.services.progress_bitmap import bitmap_revision
+        return bitmap_revision(user, course_slug)
+    if rows is not None:
+        stamps = [p.updated_at for p in rows]
+        count, last = len(stamps), max(stamps, default=None)
+    else:
+        qs = UserLessonProgress.objects.filter(user=user)
+        if course_slug:
+            qs = qs.filter(lesson__module__course_id=course_slug)
+        agg = qs.aggregate(count=Count('id'), last=Max('updated_at'))
+        count, last = agg['count'], agg['last']
+    return f"{user.pk}:{count}:{last.timestamp() if last else 0}"
+
+
+def content_etag(request, *parts, course_slug=None, revision=None):
+    """Strong ETag for user-specific course content: content version + progress revision."""
+    if revision is None:
+        revision = progress_revision(request.user, course_slug)
+    raw = ':'.join(str(p) for p in (
+        get_content_version(),
+        revision,
+        request.META.get('QUERY_STRING', ''),
+    ) + parts)
+    return '"%s"' % hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class VersionedCache:
+    """
+    Thread-safe in-process cache whose entries are only valid for the content
+    version they were built under; a version bump empties it on next access.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._entries = {}
+
+    def get_or_build(self, key, build):
+        """Returns the cached value for key, calling build() on a miss. None results are not cached."""
+        version = get_content_version()
+        with self._lock:
+            if self._version != version:
+                self._version = version
+                self._entries = {}
+            if key in self._entries:
+                return self._entries[key]
+
+        value = build()
+        if value is not None:
+            with self._lock:
+                if self._version == version:
+                    self._entries[key] = value
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._version = None
+            self._entries = {}
@@ -0,0 +1,145 @@
+from collections import namedtuple
+
+from django.db.models import Prefetch
+
+from mentor.models import Course, Module, Lesson, UserLessonProgress
+from mentor.services.content_version import VersionedCache, bitmap_reads_enabled
+from mentor.services.language import foreign_fields
+from mentor.services.lesson_index import get_lesson_index
+from mentor.services.progress_bitmap import ProgressBitmapStore
+from mentor.services.unlock import UnlockEngine
+
+
+class CourseTreeLoader:
+    """
+    Builds course responses from a shared, user-independent skeleton plus a small
+    per-user overlay (completed/unlocked flags), so the course tree itself is
+    serialized once per content version instead of once per request.
+    """
+
+    # Lesson columns the course tree actually serializes (no Markdown bodies / JSON content)
+    LESSON_TREE_FIELDS = ('id', 'module', 'slug', 'order', 'lesson_type', 'title_en', 'title_ru')
+
+    def __init__(self, user=None):
+        self.user = user
+
+    @classmethod
+    def prefetch(cls, queryset, lang=None):
+        skip = set(foreign_fields(Lesson, lang))
+        lesson_fields = [f for f in cls.LESSON_TREE_FIELDS if f not in skip]
+        return queryset.defer(*foreign_fields(Course, lang)).prefetch_related(
+            Prefetch('modules', queryset=Module.objects.defer(*foreign_fields(Module, lang)).order_by('order')),
+            Prefetch('modules__lessons', queryset=Lesson.objects.only(*lesson_fields).order_by('order')),
+        )
+
+    @staticmethod
+    def lesson_ids(skeleton):
+        # Learning order of a serialized course: modules and lessons are already sorted
+        return [lesson['id'] for module in skeleton['modules'] for lesson in module['lessons']]
+
+    def progress_map(self, course_slugs):
+        """{lesson_id: UserLessonProgress} for every lesson of the given courses (one query)."""
+        if not self.user or not self.user.is_authenticated:
+            return {}
+        if bitmap_reads_enabled():
+            return ProgressBitmapStore().progress_map(self.user, course_slugs)
+        rows = UserLessonProgress.objects.filter(user=self.user, lesson__module__course__in=course_slugs)
+        return {p.lesson_id: p for p in rows}
+
+    def lesson_states(self, skeletons):
+        """{lesson_id: LessonState} for every lesson of the given course skeletons."""
+        if not self.user or not self.user.is_authenticated:
+            return None
+        progress_map = self.progress_map([s['slug'] for s in skeletons])
+        states = {}
+        for skeleton in skeletons:
+            states.update(UnlockEngine(self.lesson_ids(skeleton), progress_map).states())
+        return states
+
+    def progress(self, skeleton):
+        """The per-user overlay on its own: [{"id", "is_completed", "is_unlocked"}, ...]."""
+        states = self.lesson_states([skeleton])
+        return [
+            dict(id=lesson['id'], **self._flags(lesson, states))
+            for module in skeleton['modules'] for lesson in module['lessons']
+        ]
+
+    def overlay(self, skeletons):
+        """Copies of the shared skeletons with the user's lesson flags merged in."""
+        states = self.lesson_states(skeletons)
+        return [
+            {**course, 'modules': [
+                {**module, 'lessons': [{**lesson, **self._flags(lesson, states)} for lesson in module['lessons']]}
+                for module in course['modules']
+            ]}
+            for course in skeletons
+        ]
+
+    @staticmethod
+    def _flags(lesson, states):
+        if states is None:
+            # Anonymous visitors: first lesson of every module is open for preview
+            return {'is_completed': False, 'is_unlocked': lesson['order'] == 1}
+        state = states.get(lesson['id'])
+        return {
+            'is_completed': bool(state and state.is_completed),
+            'is_unlocked': bool(state and state.is_unlocked),
+        }
+
+
+class CourseSkeletonCache(VersionedCache):
+    """
+    Serialized course skeletons (no user flags), keyed by course and response
+    language. Every learner of a course shares the same entry.
+    """
+
+    ALL = '*'
+
+    def get(self, slug=None, lang=None):
+        """Skeleton dict for one course, a list of all courses for slug=None, or None if missing."""
+        return self.get_or_build((slug or self.ALL, lang), lambda: self._build(slug, lang))
+
+    def _build(self, slug, lang):
+        from mentor.serializers import CourseSerializer
+
+        courses = CourseTreeLoader.prefetch(Course.objects.all(), lang)
+        context = {'skeleton': True, 'lang': lang}
+        if slug is None:
+            return CourseSerializer(list(courses), many=True, context=context).data
+        course = courses.filter(slug=slug).first()
+        if not course:
+            return None
+        return CourseSerializer(course, context=context).data
+
+
+LessonEntry = namedtuple('LessonEntry', ['payload', 'course_id', 'course_lesson_ids'])
+
+
+class LessonDetailCache(VersionedCache):
+    """
+    Fully resolved lesson detail payloads (content, steps, tasks, the preceding
+    theory reference and prev/next lesson slugs) without user flags, keyed by
+    lesson slug, response language and content format (Markdown or HTML). Also keeps the course's lesson order so the
+    unlock state needs only the user's progress rows.
+    """
+
+    def get(self, slug, lang=None, content_format=None):
+        return self.get_or_build((slug, lang, content_format), lambda: self._build(slug, lang, content_format))
+
+    def _build(self, slug, lang, content_format):
+        from mentor.serializers import LessonDetailSerializer
+
+        lesson = Lesson.objects.select_related('module').defer(*foreign_fields(Lesson, lang)).filter(slug=slug).first()
+        if not lesson:
+            return None
+        index = get_lesson_index()
+        context = {'skeleton': True, 'lang': lang, 'content_format': content_format}
+        payload = LessonDetailSerializer(lesson, context=context).data
+        payload['prev_lesson'] = index.slug(index.prev_id(lesson.id))
+        payload['next_lesson'] = index.slug(index.next_id(lesson.id))
+        course_id = lesson.module.course_id
+        return LessonEntry(payload, course_id, index.lessons_of(course_id))
+
+
+course_skeletons = CourseSkeletonCache()
+lesson_details = LessonDetailCache()
@@ -0,0 +1,60 @@
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+# Not worth starting another upstream call with less time than this left
+MIN_ATTEMPT_SECONDS = 1.0
+# One upstream call may use at most this share of the budget, so a hung model
+# still leaves time to try the next one
+ATTEMPT_SHARE = 0.5
+
+# What a GeminiService method returns instead of an answer when its deadline ran out
+TimedOut = namedtuple('TimedOut', ['method', 'seconds'])
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Deadline:
+    """
+    Time budget for the AI work of one request, shared by every fallback model and
+    retry tried on its behalf. Views start it when they begin handling the request
+    and pass it to GeminiService, which turns expiry into a TimedOut result.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    @classmethod
+    def for_method(cls, method):
+        """A fresh budget of AI_DEADLINES[method] seconds."""
+        return cls(settings.AI_DEADLINES.get(method, settings.AI_DEADLINES['default']))
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self):
+        """True once too little time is left to start another upstream call."""
+        return self.remaining() < MIN_ATTEMPT_SECONDS
+
+    def timeout(self):
+        """Timeout for the next upstream call; raises DeadlineExceeded when expired."""
+        if self.expired:
+            raise DeadlineExceeded(f"Deadline of {self.seconds}s exceeded")
+        return min(self.remaining(), self._attempt_cap())
+
+    def bounded(self, timeout):
+        """True if `timeout` was cut short by the remaining budget rather than the per-attempt cap."""
+        return timeout < self._attempt_cap()
+
+    def _attempt_cap(self):
+        return max(self.seconds * ATTEMPT_SHARE, MIN_ATTEMPT_SECONDS)
+
+
+def or_fallback(result, fallback):
+    """`fallback` in place of a TimedOut result, anything else unchanged."""
+    return fallback if isinstance(result, TimedOut) else result
@@ -0,0 +1,224 @@
+"""
+Offline stand-in for the parts of google.generativeai that GeminiService uses,
+selected with AI_BACKEND=fake. Answers are deterministic for a given prompt and
+shaped like the real ones (JSON task lists, question lists, PASSED/FAILED
+verdicts, Markdown replies); latency, streaming and 429/500 errors are simulated
+as configured in settings, so AI endpoints can be load-tested without the API.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+
+from django.conf import settings
+
+MODELS = [
+    'gemini-flash-latest', 'gemini-2.0-flash', 'gemini-2.0-flash-001', 'gemini-2.5-flash',
+    'gemini-2.5-pro', 'gemini-1.5-flash', 'gemini-1.5-flash-001', 'gemini-pro',
+]
+
+SENTENCES = [
+    "Давай разберём это по шагам.",
+    "Обрати внимание на граничные случаи.",
+    "Попробуй вывести промежуточные значения, чтобы увидеть, что происходит.",
+    "Цикл здесь можно заменить встроенной функцией.",
+    "Хорошее решение начинается с понятных имён переменных.",
+    "Проверь, что функция возвращает значение во всех ветках.",
+    "Сначала напиши простой вариант, потом оптимизируй.",
+    "Этот подход работает за линейное время.",
+]
+
+
+class FakeAPIError(Exception):
+    """Raised for injected failures; the message starts with the HTTP status like the SDK's errors."""
+
+    def __init__(self, code, message):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class FakeModelInfo:
+    def __init__(self, name):
+        self.name = f'models/{name}'
+        self.supported_generation_methods = ['generateContent', 'countTokens']
+
+
+def parse_latency(spec):
+    """
+    Sampler for a latency spec in seconds: 'fixed:S', 'uniform:MIN:MAX',
+    'normal:MEAN:STDDEV' or 'lognormal:MEDIAN:SIGMA'.
+    """
+    kind, *args = spec.split(':')
+    args = [float(a) for a in args]
+    if kind == 'fixed':
+        return lambda rng: args[0]
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(args[0], args[1])
+    if kind == 'normal':
+        return lambda rng: max(0.0, rng.gauss(args[0], args[1]))
+    if kind == 'lognormal':
+        median, sigma = args
+        return lambda rng: median * rng.lognormvariate(0, sigma)
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class _Simulator:
+    """Shared RNG and settings; one per process so runs with the same seed are repeatable."""
+
+    def __init__(self):
+        self.rng = random.Random(settings.AI_FAKE_SEED)
+        self.lock = threading.Lock()
+        self.latency = parse_latency(settings.AI_FAKE_LATENCY)
+
+    def draw(self):
+        """(latency in seconds, injected error or None) for one call."""
+        with self.lock:
+            latency = self.latency(self.rng)
+            roll = self.rng.random()
+        if roll < settings.AI_FAKE_ERROR_429:
+            return latency, FakeAPIError(429, "Resource has been exhausted (e.g. check quota).")
+        if roll < settings.AI_FAKE_ERROR_429 + settings.AI_FAKE_ERROR_500:
+            return latency, FakeAPIError(500, "An internal error has occurred.")
+        return latency, None
+
+
+_simulator = None
+_simulator_lock = threading.Lock()
+
+
+def simulator():
+    global _simulator
+    if _simulator is None:
+        with _simulator_lock:
+            if _simulator is None:
+                _simulator = _Simulator()
+    return _simulator
+
+
+def configure(api_key=None, **kwargs):
+    pass
+
+
+def list_models():
+    return [FakeModelInfo(name) for name in MODELS]
+
+
+def _prompt_text(contents):
+    if isinstance(contents, (list, tuple)):
+        return '\n'.join(_prompt_text(c) for c in contents)
+    if isinstance(contents, dict):
+        return _prompt_text(contents.get('parts', ''))
+    return str(contents)
+
+
+def answer(prompt):
+    """Deterministic reply shaped for the kind of prompt GeminiService sent."""
+    digest = hashlib.sha256(prompt.encode('utf-8')).digest()
+    match = re.search(r'Generate (\d+)', prompt)
+    count = int(match.group(1)) if match else 1
+
+    if 'Return ONLY a JSON list of strings' in prompt:
+        return json.dumps([f"Задание {i + 1}: {SENTENCES[(digest[i] + i) % len(SENTENCES)]}" for i in range(count)],
+                          ensure_ascii=False)
+    if 'multiple choice questions' in prompt:
+        return json.dumps([{
+            "id": f"temp_{i + 1}",
+            "text_en": f"Offline question {digest[i]}-{i + 1}?",
+            "text_ru": f"Офлайн-вопрос {digest[i]}-{i + 1}?",
+            "options_en": ["A", "B", "C", "D"],
+            "options_ru": ["А", "Б", "В", "Г"],
+            "correct_option": digest[i] % 4,
+            "difficulty": "junior",
+        } for i in range(count)], ensure_ascii=False)
+    if "Start your response with 'PASSED' or 'FAILED'" in prompt:
+        verdict = 'PASSED' if digest[0] % 2 == 0 else 'FAILED'
+        return f"{verdict}\n{SENTENCES[digest[1] % len(SENTENCES)]}"
+
+    sentences = [SENTENCES[b % len(SENTENCES)] for b in digest[:3 + digest[0] % 5]]
+    return f"**Офлайн-ментор.** {' '.join(sentences)}"
+
+
+class FakeResponse:
+    def __init__(self, text, chunks=None):
+        self._text = text
+        self._chunks = chunks
+
+    @property
+    def text(self):
+        return self._text
+
+    def __iter__(self):
+        for chunk in self._chunks or [self._text]:
+            time.sleep(settings.AI_FAKE_CHUNK_LATENCY)
+            yield FakeResponse(chunk)
+
+    async def _aiter(self):
+        for chunk in self._chunks or [self._text]:
+            await asyncio.sleep(settings.AI_FAKE_CHUNK_LATENCY)
+            yield FakeResponse(chunk)
+
+    def __aiter__(self):
+        return self._aiter()
+
+
+def _chunks(text):
+    words = text.split(' ')
+    size = settings.AI_FAKE_CHUNK_WORDS
+    return [' '.join(words[i:i + size]) + (' ' if i + size < len(words) else '') for i in range(0, len(words), size)]
+
+
+def _call(contents, stream, request_options):
+    """(seconds to wait, error to raise after waiting or None, response)."""
+    latency, error = simulator().draw()
+    timeout = (request_options or {}).get('timeout')
+    if timeout is not None and latency > timeout:
+        return timeout, FakeAPIError(504, "Deadline Exceeded"), None
+    text = answer(_prompt_text(contents))
+    return latency, error, FakeResponse(text, _chunks(text) if stream else None)
+
+
+class GenerativeModel:
+    def __init__(self, model_name, **kwargs):
+        self.model_name = model_name
+
+    def generate_content(self, contents, stream=False, request_options=None, **kwargs):
+        latency, error, response = _call(contents, stream, request_options)
+        time.sleep(latency)
+        if error:
+            raise error
+        return response
+
+    async def generate_content_async(self, contents, stream=False, request_options=None, **kwargs):
+        latency, error, response = _call(contents, stream, request_options)
+        await asyncio.sleep(latency)
+        if error:
+            raise error
+        return response
+
+    def start_chat(self, history=None):
+        return ChatSession(self, history)
+
+
+class ChatSession:
+    def __init__(self, model, history=None):
+        self.model = model
+        self.history = list(history or [])
+
+    def _contents(self, content):
+        return [*self.history, {"role": "user", "parts": [content]}]
+
+    def _remember(self, content, response):
+        self.history += [{"role": "user", "parts": [content]}, {"role": "model", "parts": [response.text]}]
+
+    def send_message(self, content, stream=False, request_options=None, **kwargs):
+        response = self.model.generate_content(self._contents(content), stream, request_options)
+        self._remember(content, response)
+        return response
+
+    async def send_message_async(self, content, stream=False, request_options=None, **kwargs):
+        response = await self.model.generate_content_async(self._contents(content), stream, request_options)
+        self._remember(content, response)
+        return response
@@ -0,0 +1,60 @@
+import asyncio
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import connections
+
+# results: {name: value}, with the caller's default for calls that failed or missed the deadline
+FanOut = namedtuple('FanOut', ['results', 'timed_out', 'errors'])
+
+_executor = ThreadPoolExecutor(max_workers=settings.AI_FANOUT_WORKERS, thread_name_prefix='ai-fanout')
+
+
+def _run(fn):
+    try:
+        return fn()
+    finally:
+        connections.close_all()  # Pool threads outlive the request; don't leak their DB connections
+
+
+def fan_out(calls, timeout=None, defaults=None):
+    """
+    Runs independent blocking calls ({name: zero-argument callable}) concurrently
+    on a bounded, process-wide thread pool and waits at most `timeout` seconds
+    for all of them together. Calls still running at the deadline are abandoned
+    (their threads finish in the background) and get their default.
+    """
+    timeout = settings.AI_FANOUT_DEADLINE if timeout is None else timeout
+    defaults = defaults or {}
+    futures = {_executor.submit(_run, fn): name for name, fn in calls.items()}
+    done, pending = wait(futures, timeout=timeout)
+    for future in pending:
+        future.cancel()  # Only helps calls still queued behind a busy pool
+    return _collect(((futures[f], f) for f in done), {futures[f] for f in pending}, defaults)
+
+
+async def afan_out(calls, timeout=None, defaults=None):
+    """fan_out for async views: {name: awaitable}; unfinished calls are cancelled at the deadline."""
+    timeout = settings.AI_FANOUT_DEADLINE if timeout is None else timeout
+    defaults = defaults or {}
+    tasks = {asyncio.ensure_future(aw): name for name, aw in calls.items()}
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    return _collect(((tasks[t], t) for t in done), {tasks[t] for t in pending}, defaults)
+
+
+def _collect(done, timed_out, defaults):
+    results, errors = {}, {}
+    for name, future in done:
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            print(f"Fan-out call '{name}' failed: {e}")
+            errors[name] = e
+            results[name] = defaults.get(name)
+    for name in timed_out:
+        print(f"Fan-out call '{name}' missed the deadline")
+        results[name] = defaults.get(name)
+    return FanOut(results, timed_out, errors)
@@ -0,0 +1,60 @@
+import hashlib
+
+from mentor.models import HomeworkTask, HomeworkVerdict
+
+
+def _sha256(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def task_hash(language, task):
+    """Task prose: case and whitespace do not change the assignment."""
+    return _sha256(f"{language.lower()}:{' '.join(task.split()).casefold()}")
+
+
+def submission_hash(submission):
+    """Submitted code: line endings, trailing spaces and blank edges are ignored, indentation is not."""
+    lines = [line.rstrip() for line in (submission or '').splitlines()]
+    return _sha256('\n'.join(lines).strip('\n'))
+
+
+class HomeworkStore:
+    """
+    Reference solutions and check verdicts shared across users. Homework tasks
+    repeat heavily (AI generation and the fallback pool), so each task is solved
+    once and each distinct submission to it is checked once.
+    """
+
+    def task(self, language, task, create=False):
+        key = task_hash(language, task)
+        if create:
+            row, _ = HomeworkTask.objects.get_or_create(
+                task_hash=key, defaults={'language': language.lower(), 'task_description': task}
+            )
+            return row
+        return HomeworkTask.objects.filter(task_hash=key).first()
+
+    def verdict(self, language, task, submission):
+        """(passed, feedback) from an earlier check of the same submission, or None."""
+        row = HomeworkVerdict.objects.filter(
+            task__task_hash=task_hash(language, task), submission_hash=submission_hash(submission)
+        ).values_list('passed', 'feedback').first()
+        return tuple(row) if row else None
+
+    def save_verdict(self, language, task, submission, passed, feedback):
+        HomeworkVerdict.objects.get_or_create(
+            task=self.task(language, task, create=True), submission_hash=submission_hash(submission),
+            defaults={'passed': passed, 'feedback': feedback}
+        )
+
+    def solution(self, language, task):
+        row = self.task(language, task)
+        return row.reference_solution if row else None
+
+    def save_solution(self, language, task, solution):
+        row = self.task(language, task, create=True)
+        if not row.reference_solution:
+            HomeworkTask.objects.filter(pk=row.pk).update(reference_solution=solution)
+
+
+homework_store = HomeworkStore()
@@ -0,0 +1,139 @@
+import os
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from mentor.models import Job
+
+HANDLERS = {}
+
+
+def job_handler(kind):
+    """Registers `fn(payload) -> JSON-serializable result` as the handler for a job kind."""
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def enqueue(kind, payload, user=None, dedupe_key=None, max_attempts=3):
+    """
+    Queues a job and returns it. With a dedupe_key, an existing job for the key is
+    returned instead of queuing a second one. With JOBS_INLINE the job runs right
+    away in the caller (local development without a worker).
+    """
+    if dedupe_key:
+        existing = Job.objects.filter(dedupe_key=dedupe_key).first()
+        if existing:
+            return existing
+    try:
+        job = Job.objects.create(
+            kind=kind, payload=payload, user=user, dedupe_key=dedupe_key,
+            max_attempts=max_attempts, run_after=timezone.now()
+        )
+    except IntegrityError:
+        return Job.objects.get(dedupe_key=dedupe_key)  # Lost the race to another request
+    if settings.JOBS_INLINE:
+        claimed = claim_next(worker_id='inline', job_id=job.id)
+        if claimed:
+            run(claimed)
+            job.refresh_from_db()
+    return job
+
+
+def _claimable(now):
+    # Queued and due, or running but past its visibility timeout (the worker died or hung)
+    expired = Job.objects.filter(status='running', locked_until__lt=now)
+    expired.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', error='Visibility timeout expired on the last attempt', locked_until=None, updated_at=now
+    )
+    return Job.objects.filter(Q(status='queued', run_after__lte=now) | Q(status='running', locked_until__lt=now))
+
+
+def claim_next(worker_id, job_id=None):
+    """
+    Claims one due job for this worker, or returns None. The claim is a conditional
+    UPDATE, so two workers can never both win the same job (SELECT ... FOR UPDATE
+    SKIP LOCKED only narrows contention on databases that support it).
+    """
+    now = timezone.now()
+    candidates = _claimable(now).order_by('run_after', 'id')
+    if job_id:
+        candidates = candidates.filter(id=job_id)
+    with transaction.atomic():
+        for job in candidates.select_for_update(skip_locked=True)[:10]:
+            claimed = Job.objects.filter(id=job.id, status=job.status, locked_until=job.locked_until).update(
+                status='running', attempts=F('attempts') + 1, locked_by=worker_id, updated_at=now,
+                locked_until=now + timedelta(seconds=settings.JOBS_VISIBILITY_TIMEOUT)
+            )
+            if claimed:
+                job.refresh_from_db()
+                return job
+    return None
+
+
+def run(job):
+    """Runs a claimed job; failures are retried with exponential backoff until max_attempts."""
+    handler = HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job kind '{job.kind}'")
+        result = handler(job.payload)
+    except Exception as e:
+        print(f"Job {job} failed (attempt {job.attempts}/{job.max_attempts}): {e}")
+        fields = {'error': traceback.format_exc(limit=5), 'locked_until': None, 'locked_by': ''}
+        if job.attempts < job.max_attempts and handler is not None:
+            delay = settings.JOBS_RETRY_BACKOFF * 2 ** (job.attempts - 1)
+            fields.update(status='queued', run_after=timezone.now() + timedelta(seconds=delay))
+        else:
+            fields.update(status='failed')
+        Job.objects.filter(id=job.id, attempts=job.attempts).update(updated_at=timezone.now(), **fields)
+        return False
+
+    # Guarded by the attempt number: a worker whose lease expired must not overwrite a newer claim
+    Job.objects.filter(id=job.id, attempts=job.attempts).update(
+        status='done', result=result, error='', locked_until=None, updated_at=timezone.now()
+    )
+    return True
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def work(worker_id=None, once=False, poll_interval=2.0, max_error_backoff=60.0):
+    """
+    Worker loop used by `manage.py run_jobs`. Returns the number of jobs run. Database
+    errors (e.g. a connection dropped by a Postgres restart) don't stop the worker: it
+    backs off, doubling up to max_error_backoff seconds, and reconnects.
+    """
+    worker_id = worker_id or default_worker_id()
+    count = 0
+    error_backoff = poll_interval
+    while True:
+        close_old_connections()  # Drops unusable or expired connections before each claim
+        try:
+            job = claim_next(worker_id)
+            if job:
+                run(job)
+                count += 1
+        except Exception as e:
+            print(f"Job worker {worker_id} error, retrying in {error_backoff:.0f}s: {e}")
+            traceback.print_exc()
+            if once:
+                return count
+            time.sleep(error_backoff)
+            error_backoff = min(error_backoff * 2, max_error_backoff)
+            continue
+        error_backoff = poll_interval
+        if job:
+            continue
+        if once:
+            return count
+        time.sleep(poll_interval)
@@ -0,0 +1,47 @@
+LANGUAGES = ('en', 'ru')
+
+
+def resolve_lang(request):
+    """
+    Language requested for a sliced (single-language) response, or None for the
+    default bilingual payload. `?lang=en|ru` picks one explicitly; `?lang=auto`
+    follows the Accept-Language header (browsers always send it, so it is never
+    applied implicitly).
+    """
+    lang = (request.query_params.get('lang') or '').lower()
+    if lang in LANGUAGES:
+        return lang
+    if lang == 'auto':
+        for part in request.META.get('HTTP_ACCEPT_LANGUAGE', '').split(','):
+            code = part.split(';')[0].strip().lower()[:2]
+            if code in LANGUAGES:
+                return code
+        return LANGUAGES[0]
+    return None
+
+
+def other_suffixes(lang):
+    return tuple(f'_{code}' for code in LANGUAGES if code != lang)
+
+
+def foreign_fields(model, lang):
+    """Concrete column names holding the other language(s), for .defer()."""
+    if not lang:
+        return []
+    suffixes = other_suffixes(lang)
+    return [f.name for f in model._meta.concrete_fields if f.name.endswith(suffixes)]
+
+
+def slice_json(value, lang):
+    """Drops other-language keys inside JSON content (theory_steps, practice_tasks)."""
+    if isinstance(value, list):
+        return [slice_json(item, lang) for item in value]
+    if isinstance(value, dict):
+        suffixes = other_suffixes(lang)
+        return {k: slice_json(v, lang) for k, v in value.items() if not k.endswith(suffixes)}
+    return value
+
+
+def resolve_content_format(request):
+    """'html' for ?content_format=html (pre-rendered lesson content), None for the raw Markdown default."""
+    return 'html' if (request.query_params.get('content_format') or '').lower() == 'html' else None
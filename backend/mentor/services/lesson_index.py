@@ -0,0 +1,61 @@
+from collections import namedtuple
+
+from mentor.models import Lesson
+from mentor.services.content_version import VersionedCache, get_content_version
+
+# course_id/position: place inside the course; sequence: place in the global order
+LessonNav = namedtuple('LessonNav', ['course_id', 'position', 'sequence', 'prev_id', 'next_id'])
+
+
+class LessonIndex:
+    """
+    In-memory navigation index over every lesson in learning order (course, then
+    module order, then lesson order), built once per content version. Next/prev
+    links cross module boundaries but never course boundaries.
+    """
+
+    def __init__(self, rows, version):
+        # rows: (lesson_id, course_id, slug) already sorted in learning order
+        self.version = version
+        self.course_lessons = {}
+        self.slugs = {}
+        self.nav = {}
+        for sequence, (lesson_id, course_id, slug) in enumerate(rows):
+            lessons = self.course_lessons.setdefault(course_id, [])
+            prev_id = lessons[-1] if lessons else None
+            if prev_id:
+                self.nav[prev_id] = self.nav[prev_id]._replace(next_id=lesson_id)
+            self.nav[lesson_id] = LessonNav(course_id, len(lessons), sequence, prev_id, None)
+            self.slugs[lesson_id] = slug
+            lessons.append(lesson_id)
+
+    def locate(self, lesson_id):
+        """(course_id, position) of a lesson, or (None, None) if unknown."""
+        nav = self.nav.get(lesson_id)
+        return (nav.course_id, nav.position) if nav else (None, None)
+
+    def lessons_of(self, course_id):
+        return self.course_lessons.get(course_id, [])
+
+    def next_id(self, lesson_id):
+        nav = self.nav.get(lesson_id)
+        return nav.next_id if nav else None
+
+    def prev_id(self, lesson_id):
+        nav = self.nav.get(lesson_id)
+        return nav.prev_id if nav else None
+
+    def slug(self, lesson_id):
+        return self.slugs.get(lesson_id)
+
+
+_index_cache = VersionedCache()
+
+
+def _build_index():
+    rows = Lesson.objects.order_by('module__course_id', 'module__order', 'order').values_list('id', 'module__course_id', 'slug')
+    return LessonIndex(list(rows), get_content_version())
+
+
+def get_lesson_index():
+    return _index_cache.get_or_build('lessons', _build_index)
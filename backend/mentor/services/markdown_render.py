@@ -0,0 +1,67 @@
+import html
+
+try:
+    import markdown
+except ImportError:
+    markdown = None
+
+try:
+    import nh3
+except ImportError:
+    nh3 = None
+
+ALLOWED_TAGS = {
+    'p', 'br', 'hr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'strong', 'em', 'b', 'i', 'del',
+    'ul', 'ol', 'li', 'blockquote', 'pre', 'code', 'a', 'table', 'thead', 'tbody', 'tr', 'th', 'td',
+}
+ALLOWED_ATTRIBUTES = {
+    'a': {'href', 'title'},
+    'code': {'class'},  # language-xxx from fenced code blocks
+}
+
+
+def render_markdown(text):
+    """Lesson Markdown -> sanitized HTML. Falls back to escaped text if the libraries are missing."""
+    if not text:
+        return ''
+    if markdown is None or nh3 is None:
+        return ''.join(f"<p>{html.escape(p)}</p>" for p in text.split('\n\n') if p.strip())
+    raw = markdown.markdown(text, extensions=['fenced_code', 'tables', 'sane_lists'])
+    return nh3.clean(raw, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES)
+
+
+def render_lesson(lesson):
+    """Fills the lesson's pre-rendered HTML fields from its Markdown content (does not save)."""
+    lesson.content_html_en = render_markdown(lesson.content_en)
+    lesson.content_html_ru = render_markdown(lesson.content_ru)
+    lesson.theory_steps_html = render_steps(lesson.theory_steps)
+    return lesson
+
+
+def render_steps(steps):
+    return [
+        {'text_en': render_markdown(step.get('text_en', '')), 'text_ru': render_markdown(step.get('text_ru', ''))}
+        for step in (steps or [])
+    ]
+
+
+def lesson_html(lesson, lang):
+    """Stored HTML for the lesson content; renders on the fly for lessons the loaders have not seen."""
+    stored = getattr(lesson, f'content_html_{lang}')
+    return stored or render_markdown(getattr(lesson, f'content_{lang}'))
+
+
+def lesson_steps_html(lesson):
+    steps = lesson.theory_steps or []
+    if len(lesson.theory_steps_html or []) == len(steps):
+        return lesson.theory_steps_html
+    return render_steps(steps)
+
+
+def prerender_lessons(queryset=None):
+    """Called by the curriculum loaders: renders every lesson once for the new content version."""
+    from mentor.models import Lesson
+
+    lessons = [render_lesson(l) for l in (queryset if queryset is not None else Lesson.objects.all())]
+    Lesson.objects.bulk_update(lessons, ['content_html_en', 'content_html_ru', 'theory_steps_html'], batch_size=200)
+    return len(lessons)
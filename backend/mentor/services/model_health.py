@@ -0,0 +1,130 @@
+import re
+import threading
+import time
+
+from django.conf import settings
+
+
+class NoHealthyModel(Exception):
+    """Every candidate model is cooling down; raised without calling the API."""
+
+
+def is_quota_error(error):
+    text = str(error)
+    return "429" in text or "Quota" in text
+
+
+def _status(error):
+    """HTTP status of an SDK error: its `code`, else a leading 'NNN ' in the message."""
+    code = getattr(error, 'code', None)
+    if isinstance(code, int):
+        return code
+    match = re.match(r'\s*(\d{3})\b', str(error))
+    return int(match.group(1)) if match else None
+
+
+def is_timeout_error(error):
+    return isinstance(error, TimeoutError) or _status(error) in (408, 504)
+
+
+def is_upstream_error(error):
+    """
+    True for failures the model side caused: quota (429), 5xx, timeouts and dropped
+    connections. Prompt, validation and other client errors say nothing about its health.
+    """
+    status = _status(error)
+    if status is not None:
+        return status in (408, 429) or status >= 500
+    return is_quota_error(error) or isinstance(error, (TimeoutError, ConnectionError))
+
+
+class _ModelState:
+    def __init__(self):
+        self.failures = 0          # consecutive failures
+        self.trips = 0             # consecutive times the breaker opened, grows the cooldown
+        self.open_until = 0.0      # monotonic time the cooldown ends
+        self.probe_started = None  # half-open: monotonic start of the single probe call
+
+
+class ModelHealth:
+    """
+    Per-process circuit breaker for Gemini models.
+
+    closed:    calls go through; `failure_threshold` consecutive failures (or one
+               quota error) open the breaker.
+    open:      the model is skipped until its cooldown ends. The cooldown doubles
+               each time the breaker re-opens, up to `max_cooldown`.
+    half-open: after the cooldown one caller probes the model; success closes the
+               breaker, failure re-opens it. A probe that never reports back
+               (killed worker) is abandoned after one base cooldown.
+
+    Only upstream errors (is_upstream_error) count as failures. Timeouts count only
+    when the model had its full per-attempt time, not when the caller's nearly spent
+    deadline cut the call short.
+    """
+
+    def __init__(self, failure_threshold, cooldown, max_cooldown):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, model_name):
+        """True if the caller may try the model now (closed, or granted the half-open probe)."""
+        now = time.monotonic()
+        with self._lock:
+            state = self._states.setdefault(model_name, _ModelState())
+            if state.open_until <= 0:
+                return True
+            if now < state.open_until:
+                return False
+            if state.probe_started is not None and now - state.probe_started < self.cooldown:
+                return False
+            state.probe_started = now
+            return True
+
+    def release(self, model_name):
+        """Gives back a granted call that never reached the model (e.g. rate limited), freeing a half-open probe."""
+        with self._lock:
+            state = self._states.get(model_name)
+            if state is not None:
+                state.probe_started = None
+
+    def record_success(self, model_name):
+        with self._lock:
+            self._states[model_name] = _ModelState()
+
+    def record_failure(self, model_name, error=None, deadline_bound=False):
+        """
+        error: the exception the call raised. deadline_bound: the call's timeout was cut
+        short by the caller's deadline (Deadline.bounded), so timing out is not the model's fault.
+        """
+        if error is not None and (not is_upstream_error(error) or (deadline_bound and is_timeout_error(error))):
+            self.release(model_name)  # Says nothing about the model; let the next caller probe
+            return
+        now = time.monotonic()
+        with self._lock:
+            state = self._states.setdefault(model_name, _ModelState())
+            state.failures += 1
+            half_open = state.open_until > 0
+            if half_open or state.failures >= self.failure_threshold or is_quota_error(error):
+                state.trips += 1
+                state.open_until = now + min(self.cooldown * 2 ** (state.trips - 1), self.max_cooldown)
+            state.probe_started = None
+
+    def snapshot(self):
+        """{model: 'closed' | 'open' | 'half-open'} for diagnostics."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                name: 'closed' if s.open_until <= 0 else ('open' if now < s.open_until else 'half-open')
+                for name, s in self._states.items()
+            }
+
+
+model_health = ModelHealth(
+    failure_threshold=settings.AI_MODEL_FAILURE_THRESHOLD,
+    cooldown=settings.AI_MODEL_COOLDOWN,
+    max_cooldown=settings.AI_MODEL_MAX_COOLDOWN,
+)
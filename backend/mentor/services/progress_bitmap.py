@@ -0,0 +1,129 @@
+import hashlib
+from collections import namedtuple
+
+from django.db import transaction
+
+from mentor.models import CourseProgress, CourseProgressAttempt, UserLessonProgress
+from mentor.services.lesson_index import get_lesson_index
+
+# Stand-in for UserLessonProgress in progress maps built from a bitmap row
+LessonFlags = namedtuple('LessonFlags', ['is_completed', 'is_unlocked', 'updated_at'])
+
+
+def encode_bits(value):
+    return value.to_bytes((value.bit_length() + 7) // 8, 'little')
+
+
+def decode_bits(raw):
+    return int.from_bytes(bytes(raw or b''), 'little')
+
+
+def set_bit(value, pos, on):
+    return value | (1 << pos) if on else value & ~(1 << pos)
+
+
+class ProgressBitmapStore:
+    """
+    Keeps one CourseProgress row per (user, course) in sync with UserLessonProgress
+    and reads a learner's whole course state from it. UserLessonProgress stays the
+    source of truth: missing rows, or rows built under an older content version,
+    are rebuilt from it.
+    """
+
+    def __init__(self):
+        self.index = get_lesson_index()
+
+    def rebuild(self, user_id, course_id):
+        completed = unlocked = 0
+        attempts = []
+        rows = UserLessonProgress.objects.filter(user_id=user_id, lesson__module__course_id=course_id)
+        for p in rows.only('lesson', 'is_completed', 'is_unlocked', 'failed_attempts'):
+            _, pos = self.index.locate(p.lesson_id)
+            if pos is None:
+                continue
+            completed = set_bit(completed, pos, p.is_completed)
+            unlocked = set_bit(unlocked, pos, p.is_unlocked)
+            if p.failed_attempts > 0:
+                attempts.append((p.lesson_id, p.failed_attempts))
+
+        with transaction.atomic():
+            row, _ = CourseProgress.objects.update_or_create(
+                user_id=user_id, course_id=course_id,
+                defaults={
+                    'completed_bits': encode_bits(completed),
+                    'unlocked_bits': encode_bits(unlocked),
+                    'content_version': self.index.version,
+                }
+            )
+            row.attempts.all().delete()
+            CourseProgressAttempt.objects.bulk_create([
+                CourseProgressAttempt(course_progress=row, lesson_id=lesson_id, failed_attempts=count)
+                for lesson_id, count in attempts
+            ])
+        return row
+
+    def apply(self, progress):
+        """Mirrors one saved UserLessonProgress row into its course bitmap."""
+        course_id, pos = self.index.locate(progress.lesson_id)
+        if course_id is None:
+            return None  # Lesson added outside the loaders; picked up on the next rebuild
+
+        with transaction.atomic():
+            row = CourseProgress.objects.select_for_update().filter(user_id=progress.user_id, course_id=course_id).first()
+            if row is None or row.content_version != self.index.version:
+                return self.rebuild(progress.user_id, course_id)
+
+            row.completed_bits = encode_bits(set_bit(decode_bits(row.completed_bits), pos, progress.is_completed))
+            row.unlocked_bits = encode_bits(set_bit(decode_bits(row.unlocked_bits), pos, progress.is_unlocked))
+            row.save()
+
+            if progress.failed_attempts > 0:
+                CourseProgressAttempt.objects.update_or_create(
+                    course_progress=row, lesson_id=progress.lesson_id,
+                    defaults={'failed_attempts': progress.failed_attempts}
+                )
+            else:
+                row.attempts.filter(lesson_id=progress.lesson_id).delete()
+        return row
+
+    def load(self, user, course_ids):
+        """
+        {course_id: CourseProgress} - one query when rows are current. A course without
+        a row has no progress yet (every write mirrors into a row), so it reads as an
+        empty, unsaved bitmap rather than writing one during a GET.
+        """
+        rows = {r.course_id: r for r in CourseProgress.objects.filter(user=user, course_id__in=course_ids)}
+        for course_id in course_ids:
+            row = rows.get(course_id)
+            if row is None:
+                rows[course_id] = CourseProgress(user=user, course_id=course_id, content_version=self.index.version)
+            elif row.content_version != self.index.version:
+                rows[course_id] = self.rebuild(user.pk, course_id)
+        return rows
+
+    def progress_map(self, user, course_ids):
+        """{lesson_id: LessonFlags} for lessons with any flag set, same shape as a UserLessonProgress map."""
+        progress = {}
+        for course_id, row in self.load(user, course_ids).items():
+            completed = decode_bits(row.completed_bits)
+            unlocked = decode_bits(row.unlocked_bits)
+            for pos, lesson_id in enumerate(self.index.lessons_of(course_id)):
+                is_completed = bool(completed >> pos & 1)
+                is_unlocked = bool(unlocked >> pos & 1)
+                if is_completed or is_unlocked:
+                    progress[lesson_id] = LessonFlags(is_completed, is_unlocked, row.updated_at)
+        return progress
+
+
+def bitmap_revision(user, course_id=None):
+    """
+    Derived from the bits themselves rather than updated_at, so rebuilding a row after
+    a content version bump only changes the revision if the learner's flags moved.
+    """
+    rows = CourseProgress.objects.filter(user=user)
+    if course_id:
+        rows = rows.filter(course_id=course_id)
+    digest = hashlib.sha1()
+    for course, completed, unlocked in rows.order_by('course_id').values_list('course_id', 'completed_bits', 'unlocked_bits'):
+        digest.update(f"{course}:{bytes(completed).hex()}:{bytes(unlocked).hex()};".encode())
+    return f"{user.pk}:bits:{digest.hexdigest()}"
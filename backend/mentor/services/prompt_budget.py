@@ -0,0 +1,143 @@
+import re
+from collections import namedtuple
+
+from django.conf import settings
+
+ELLIPSIS = '…'
+# Per-message overhead of role markers and separators
+MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(text):
+    """
+    Local token estimate: ~4 UTF-8 bytes per token, which holds for English and code
+    and, at 2 bytes per letter, for Russian too. Good enough for budgeting without a
+    count_tokens round trip.
+    """
+    return (len(str(text or '').encode('utf-8')) + 3) // 4
+
+
+def history_tokens(history):
+    return sum(estimate_tokens(m['content']) + MESSAGE_OVERHEAD for m in history)
+
+
+def _cut(text, tokens):
+    """Longest prefix of `text` within `tokens`."""
+    data = str(text).encode('utf-8')[:max(tokens, 0) * 4]
+    return data.decode('utf-8', errors='ignore')
+
+
+def keep_head(text, tokens):
+    """Start of `text` (lesson theory and task statements lead with what matters)."""
+    text = text or ''
+    if estimate_tokens(text) <= tokens:
+        return text
+    return _cut(text, tokens - 1).rstrip() + ELLIPSIS if tokens > 1 else ''
+
+
+def keep_ends(text, tokens):
+    """Start and end of `text` (error messages and tracebacks: exception type and last frames)."""
+    text = text or ''
+    if estimate_tokens(text) <= tokens:
+        return text
+    if tokens <= 2:
+        return ''
+    head = _cut(text, tokens // 2 - 1)
+    tail = _cut(text[::-1], tokens - tokens // 2 - 1)[::-1]
+    return f"{head}{ELLIPSIS}{tail}"
+
+
+def code_window(code, tokens, cursor_line=None):
+    """
+    Lines of `code` around `cursor_line` (1-based; the end of the buffer when unknown,
+    which is where learners usually type), grown outwards while they fit.
+    """
+    code = code or ''
+    if estimate_tokens(code) <= tokens:
+        return code
+    lines = code.splitlines()
+    try:
+        cursor = int(cursor_line or len(lines))
+    except (TypeError, ValueError):
+        cursor = len(lines)
+    cursor = min(max(cursor, 1), len(lines)) - 1
+    start = end = cursor
+    used = estimate_tokens(lines[cursor]) + 2
+    if used > tokens:
+        return keep_head(lines[cursor], tokens)
+    while True:
+        grown = False
+        for i in (end + 1, start - 1):
+            if 0 <= i < len(lines) and not start <= i <= end:
+                cost = estimate_tokens(lines[i]) + 1
+                if used + cost > tokens:
+                    continue
+                used += cost
+                start, end = min(start, i), max(end, i)
+                grown = True
+        if not grown:
+            break
+    window = lines[start:end + 1]
+    if start > 0:
+        window.insert(0, f"{ELLIPSIS} ({start} lines above)")
+    if end < len(lines) - 1:
+        window.append(f"{ELLIPSIS} ({len(lines) - 1 - end} lines below)")
+    return '\n'.join(window)
+
+
+def recent_history(history, tokens):
+    """The most recent messages of a chat history that fit in `tokens`."""
+    kept = []
+    for message in reversed(history):
+        tokens -= estimate_tokens(message['content']) + MESSAGE_OVERHEAD
+        if tokens < 0:
+            break
+        kept.append(message)
+    return kept[::-1]
+
+
+def error_line(error_message):
+    """Line number an error message points at, if any ('line 12', 'main.py:12:5', ...)."""
+    for pattern in (r'line (\d+)', r'\w:(\d+)(?::\d+)?\b'):
+        match = re.search(pattern, error_message or '')
+        if match:
+            return int(match.group(1))
+    return None
+
+
+# value: a string or a chat history list; fit(value, tokens) -> value cut down to `tokens`;
+# cap: largest share of the budget the section may take even when the others are short
+Section = namedtuple('Section', ['name', 'value', 'priority', 'fit', 'cap'], defaults=[None])
+
+
+def section_tokens(value):
+    return history_tokens(value) if isinstance(value, list) else estimate_tokens(value)
+
+
+def fit_sections(sections, budget):
+    """
+    {name: value} for prompt sections whose total fits `budget` tokens. Sections over
+    their cap are cut to it first; past that they are cut lowest priority first, each
+    only as far as needed, so high-priority ones (the learner's question, the code they
+    are on) stay whole as long as anything else can give.
+    """
+    fitted = {s.name: s.value for s in sections}
+    if sum(section_tokens(s.value) for s in sections) <= budget:
+        return fitted
+    for s in sections:
+        if s.cap and section_tokens(s.value) > budget * s.cap:
+            fitted[s.name] = s.fit(s.value, int(budget * s.cap))
+    sections = [s._replace(value=fitted[s.name]) for s in sections]
+    over = sum(section_tokens(s.value) for s in sections) - budget
+    for s in sorted(sections, key=lambda s: s.priority):
+        if over <= 0:
+            break
+        size = section_tokens(s.value)
+        fitted[s.name] = s.fit(s.value, max(size - over, 0))
+        over -= size - section_tokens(fitted[s.name])
+    return fitted
+
+
+def prompt_budget(method):
+    """Token budget for the variable sections of `method`'s prompt (AI_PROMPT_BUDGETS)."""
+    return settings.AI_PROMPT_BUDGETS[method]
@@ -0,0 +1,142 @@
+import asyncio
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction
+
+from mentor.services.deadline import DeadlineExceeded
+
+# Share of the bucket each class must leave for higher ones. Interactive calls may take
+# the last token; bulk work stops at half, so it is shed long before anyone interactive waits.
+PRIORITY_FLOORS = {
+    'interactive': 0.0,
+    'normal': 0.2,
+    'bulk': 0.5,
+}
+# Classes that give up instead of waiting for tokens
+SHED = {'bulk'}
+CAS_RETRIES = 5
+
+
+class RateLimited(Exception):
+    """A low-priority call was shed to keep quota for interactive ones; retry later."""
+
+
+class _Bucket:
+    """Token bucket math; subclasses keep the state per process or in the DB."""
+
+    def __init__(self, per_minute, burst):
+        self.rate = per_minute / 60.0
+        self.capacity = burst
+
+    def _refill(self, tokens, refilled_at, now):
+        return min(self.capacity, tokens + (now - refilled_at) * self.rate)
+
+    def _decide(self, tokens, floor):
+        """(tokens left, seconds to wait or 0 if granted)."""
+        if tokens - 1 >= floor:
+            return tokens - 1, 0.0
+        return tokens, (floor + 1 - tokens) / self.rate
+
+
+class LocalBucket(_Bucket):
+    """Per-process bucket (single worker, development)."""
+
+    def __init__(self, per_minute, burst):
+        super().__init__(per_minute, burst)
+        self.tokens = burst
+        self.refilled_at = time.time()
+        self._lock = threading.Lock()
+
+    def take(self, floor):
+        with self._lock:
+            now = time.time()
+            self.tokens, wait = self._decide(self._refill(self.tokens, self.refilled_at, now), floor)
+            self.refilled_at = now
+            return wait
+
+
+class DBBucket(_Bucket):
+    """Bucket in a RateBucket row shared by all workers."""
+
+    def __init__(self, per_minute, burst, name='gemini'):
+        super().__init__(per_minute, burst)
+        self.name = name
+
+    def take(self, floor):
+        try:
+            return self._take(floor)
+        except DatabaseError as e:
+            # Locked table, dropped connection...: the limiter is advisory, never fail the call on it
+            print(f"Rate bucket '{self.name}' unavailable, letting the call through: {e}")
+            return 0.0
+
+    def _take(self, floor):
+        from mentor.models import RateBucket
+
+        for _ in range(CAS_RETRIES):
+            now = time.time()
+            row = RateBucket.objects.filter(name=self.name).values('tokens', 'refilled_at', 'version').first()
+            if row is None:
+                try:
+                    with transaction.atomic():
+                        RateBucket.objects.create(name=self.name, tokens=self.capacity, refilled_at=now)
+                except IntegrityError:
+                    pass  # Another worker created it first
+                continue
+            tokens, wait = self._decide(self._refill(row['tokens'], row['refilled_at'], now), floor)
+            # Compare-and-swap: works on every database, SQLite included (no SELECT ... FOR UPDATE there)
+            if RateBucket.objects.filter(name=self.name, version=row['version']).update(
+                tokens=tokens, refilled_at=now, version=row['version'] + 1
+            ):
+                return wait
+        return 0.0  # Heavy contention: let the call through rather than stall it on bookkeeping
+
+
+class RateLimiter:
+    """
+    Client-side limit on Gemini calls in front of GeminiService. Every call takes a
+    token; interactive and normal calls wait for one within their deadline, bulk
+    calls raise RateLimited so the caller can skip or defer the work.
+    """
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+
+    def _floor(self, priority):
+        return PRIORITY_FLOORS[priority] * self.bucket.capacity
+
+    def _check(self, priority, wait, deadline):
+        """Seconds to sleep before trying again; raises when the caller should not wait."""
+        if priority in SHED:
+            raise RateLimited(f"Rate limit reached; {priority} call shed")
+        if deadline is not None and wait > deadline.remaining():
+            raise DeadlineExceeded(f"Rate limit wait of {wait:.1f}s exceeds the deadline")
+        return wait
+
+    def acquire(self, priority, deadline=None):
+        while True:
+            wait = self.bucket.take(self._floor(priority))
+            if not wait:
+                return
+            time.sleep(self._check(priority, wait, deadline))
+
+    async def aacquire(self, priority, deadline=None):
+        while True:
+            wait = await sync_to_async(self.bucket.take)(self._floor(priority))
+            if not wait:
+                return
+            await asyncio.sleep(self._check(priority, wait, deadline))
+
+
+def build_rate_limiter():
+    """Limiter named by AI_RATE_LIMIT_BACKEND: 'db', 'local', or 'none' to disable."""
+    backend = settings.AI_RATE_LIMIT_BACKEND
+    per_minute, burst = settings.AI_RATE_LIMIT_PER_MINUTE, settings.AI_RATE_LIMIT_BURST
+    if backend == 'db':
+        return RateLimiter(DBBucket(per_minute, burst))
+    if backend == 'local':
+        return RateLimiter(LocalBucket(per_minute, burst))
+    return None
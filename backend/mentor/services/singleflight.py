@@ -0,0 +1,93 @@
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from mentor.models import Lease
+from mentor.services.jobs import default_worker_id
+
+LEASE_POLL_INTERVAL = 0.25
+
+
+def acquire_lease(key, holder, ttl):
+    """Takes the lease on `key` for `ttl` seconds; False while someone else holds it."""
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=ttl)
+    # Take over a lease its holder never released (crashed or killed mid-call)
+    if Lease.objects.filter(key=key, expires_at__lt=now).update(holder=holder, expires_at=expires_at):
+        return True
+    try:
+        with transaction.atomic():
+            Lease.objects.create(key=key, holder=holder, expires_at=expires_at)
+        return True
+    except IntegrityError:
+        return False
+
+
+def release_lease(key, holder):
+    Lease.objects.filter(key=key, holder=holder).delete()
+
+
+def wait_for_lease(key, timeout):
+    """Waits up to `timeout` seconds for the current holder of `key` to finish. True if it did."""
+    deadline = time.monotonic() + timeout
+    while Lease.objects.filter(key=key, expires_at__gte=timezone.now()).exists():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(LEASE_POLL_INTERVAL)
+    return True
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class SingleFlight:
+    """
+    Runs at most one `fn` per key at a time across threads and worker processes.
+    Threads of this process wait on the running call and share its result; other
+    workers are kept out by a Lease row and wait for it to be released. Callers
+    that waited on another worker get None and should re-read what `fn` produces.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, wait, lease_ttl):
+        """
+        wait: seconds a caller that finds the key busy waits for it (0 returns at once).
+        lease_ttl: how long the lease outlives a holder that dies mid-call.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait(wait)
+            return call.result
+
+        holder = f"{default_worker_id()}:{uuid.uuid4().hex[:8]}"
+        try:
+            if acquire_lease(key, holder, lease_ttl):
+                try:
+                    call.result = fn()
+                finally:
+                    release_lease(key, holder)
+            elif wait:
+                wait_for_lease(key, wait)
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+singleflight = SingleFlight()
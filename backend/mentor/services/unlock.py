@@ -0,0 +1,64 @@
+from collections import namedtuple
+
+from mentor.models import UserLessonProgress
+from mentor.services.lesson_index import get_lesson_index
+
+LessonState = namedtuple('LessonState', ['is_completed', 'is_unlocked'])
+
+
+class UnlockEngine:
+    """
+    Single source of truth for lesson unlock rules.
+
+    Takes the course's lesson ids in learning order (module order, then lesson order)
+    and the user's {lesson_id: UserLessonProgress} map, and computes every lesson's
+    state in one linear pass:
+      - the first lesson of the course is always unlocked
+      - a lesson explicitly unlocked in its progress row stays unlocked
+      - otherwise a lesson is unlocked once the lesson before it is completed
+        (across module boundaries)
+    """
+
+    def __init__(self, lesson_ids, progress_map=None):
+        self.lesson_ids = list(lesson_ids)
+        self.progress_map = progress_map or {}
+        self._states = None
+
+    @classmethod
+    def for_course(cls, course_id, user=None):
+        """Builds an engine from the in-memory lesson index and one progress query."""
+        lesson_ids = get_lesson_index().lessons_of(course_id)
+        progress_map = {}
+        if user and user.is_authenticated:
+            rows = UserLessonProgress.objects.filter(user=user, lesson__module__course_id=course_id)
+            progress_map = {p.lesson_id: p for p in rows}
+        return cls(lesson_ids, progress_map)
+
+    def states(self):
+        if self._states is None:
+            states = {}
+            prev_completed = True  # Nothing before the first lesson
+            for lesson_id in self.lesson_ids:
+                progress = self.progress_map.get(lesson_id)
+                completed = bool(progress and progress.is_completed)
+                unlocked = bool(progress and progress.is_unlocked) or prev_completed
+                states[lesson_id] = LessonState(completed, unlocked)
+                prev_completed = completed
+            self._states = states
+        return self._states
+
+    def state(self, lesson_id):
+        return self.states().get(lesson_id, LessonState(False, False))
+
+    def is_unlocked(self, lesson_id):
+        return self.state(lesson_id).is_unlocked
+
+
+def unlock_next_lesson(user, lesson):
+    """Marks the lesson after `lesson` (crossing module boundaries) as unlocked for the user."""
+    next_id = get_lesson_index().next_id(lesson.id)
+    if next_id:
+        UserLessonProgress.objects.update_or_create(
+            user=user, lesson_id=next_id, defaults={'is_unlocked': True}
+        )
+    return next_id
@@ -0,0 +1,40 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import UserLessonProgress
+from .services.content_version import bitmap_reads_enabled
+from .services.progress_bitmap import ProgressBitmapStore
+
+
+# Keep the compact CourseProgress bitmaps in sync with lesson progress writes while they
+# are read (PROGRESS_BITMAP_READS). The mirror runs after commit, so the bitmap row lock
+# is never held inside the request's own transaction.
+
+@receiver(post_save, sender=UserLessonProgress)
+def sync_course_progress(sender, instance, **kwargs):
+    if not bitmap_reads_enabled():
+        return
+    transaction.on_commit(lambda: ProgressBitmapStore().apply(instance))
+
+
+@receiver(post_delete, sender=UserLessonProgress)
+def rebuild_course_progress(sender, instance, origin=None, **kwargs):
+    if not bitmap_reads_enabled():
+        return
+    origin_model = getattr(origin, 'model', None) or type(origin)
+    if origin is not None and origin_model is not UserLessonProgress:
+        # Cascade from a lesson/module/course/user delete: the curriculum loaders bump the
+        # content version afterwards, which rebuilds the affected bitmaps on next read
+        return
+
+    store = ProgressBitmapStore()
+    course_id, _ = store.index.locate(instance.lesson_id)
+    if not course_id:
+        return
+    # One rebuild per (user, course) for a queryset delete, not one per deleted row
+    pending = origin.__dict__.setdefault('_bitmap_rebuilds', set()) if origin is not None else set()
+    key = (instance.user_id, course_id)
+    if key not in pending:
+        pending.add(key)
+        transaction.on_commit(lambda: store.rebuild(*key))
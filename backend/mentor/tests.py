@@ -1,3 +1,772 @@
-from django.test import TestCase
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import AsyncClient, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from mentor import jobs as job_handlers
+from mentor.renderers import FastJSONRenderer
+from mentor.models import (
+    ChatMessage, ChatSession, Course, CourseProgress, Homework, Job, Lesson, Module, RateBucket, TestQuestion,
+    TestResult, UserLessonProgress
+)
+from mentor import views
+from mentor.services import ai_service, fake_gemini, jobs, lesson_index
+from mentor.services.ai_service import CHAT_MODEL, FALLBACK_MODELS, GeminiService
+from mentor.services.content_version import bump_content_version, forget_content_version
+from mentor.services.course_tree import course_skeletons, lesson_details
+from mentor.services.fake_gemini import FakeAPIError
+from mentor.services.model_health import ModelHealth
+from mentor.services.deadline import Deadline, DeadlineExceeded
+from mentor.services.progress_bitmap import ProgressBitmapStore
+from mentor.services.rate_limit import DBBucket, RateLimited, RateLimiter
+
+
+class LessonIndexTests(TestCase):
+    def setUp(self):
+        forget_content_version()
+        lesson_index._index_cache.clear()
+        course = Course.objects.create(slug='backend', title_en='Backend', description_en='')
+        module = Module.objects.create(course=course, title_en='Basics', order=1)
+        self.first = Lesson.objects.create(module=module, slug='intro', order=1, title_en='Intro')
+        self.second = Lesson.objects.create(module=module, slug='vars', order=2, title_en='Vars')
+        bump_content_version()
+
+    def test_warm_lookups_need_no_queries(self):
+        lesson_index.get_lesson_index()
+        with self.assertNumQueries(0):
+            index = lesson_index.get_lesson_index()
+            self.assertEqual(index.next_id(self.first.id), self.second.id)
+            self.assertEqual(index.prev_id(self.second.id), self.first.id)
+
+    def test_bump_rebuilds_index(self):
+        lesson_index.get_lesson_index()
+        third = Lesson.objects.create(module=self.second.module, slug='loops', order=3, title_en='Loops')
+        bump_content_version()
+        self.assertEqual(lesson_index.get_lesson_index().next_id(self.second.id), third.id)
+
+    @override_settings(CONTENT_VERSION_TTL=0)
+    def test_zero_ttl_rereads_version(self):
+        lesson_index.get_lesson_index()
+        with self.assertNumQueries(1):
+            lesson_index.get_lesson_index()
+
+
+class CourseAPITestCase(TestCase):
+    """Two courses of different sizes behind cold per-version caches, and a logged-in learner."""
+
+    def setUp(self):
+        for cache in (course_skeletons, lesson_details, lesson_index._index_cache):
+            cache.clear()
+        forget_content_version()
+        self.user = get_user_model().objects.create_user(username='learner', password='pw')
+        self.build_course('small', modules=1, lessons=2)
+        self.build_course('large', modules=4, lessons=5)
+        bump_content_version()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def build_course(self, slug, modules, lessons):
+        # The learner has finished the first lesson of every module
+        course = Course.objects.create(slug=slug, title_en=slug.title(), description_en='')
+        for m in range(modules):
+            module = Module.objects.create(course=course, title_en=f'Module {m}', order=m + 1)
+            for n in range(lessons):
+                lesson = Lesson.objects.create(module=module, slug=f'{slug}-{m}-{n}', order=n + 1, title_en=f'Lesson {n}')
+                if n == 0:
+                    UserLessonProgress.objects.create(user=self.user, lesson=lesson, is_completed=True, is_unlocked=True)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(queries)
+
+
+class QueryCountTests(CourseAPITestCase):
+    def test_course_detail_queries_do_not_grow_with_the_tree(self):
+        self.assertEqual(self.count_queries('/api/courses/small/'), self.count_queries('/api/courses/large/'))
+        with self.assertNumQueries(2):  # ETag progress revision + progress rows
+            self.client.get('/api/courses/large/')
+
+    def test_lesson_detail_queries_do_not_grow_with_the_course(self):
+        lesson_index.get_lesson_index()  # Built once per content version, not per request
+        self.assertEqual(self.count_queries('/api/lessons/small-0-1/'), self.count_queries('/api/lessons/large-3-4/'))
+        with self.assertNumQueries(1):  # Progress rows for the lesson's course
+            self.client.get('/api/lessons/large-3-4/')
+
+
+class ETagTests(CourseAPITestCase):
+    def test_matching_etag_gets_304(self):
+        for url in ('/api/courses/', '/api/courses/large/', '/api/lessons/large-0-1/'):
+            etag = self.client.get(url)['ETag']
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304, url)
+
+    def test_content_version_bump_changes_the_etag(self):
+        for url in ('/api/courses/large/', '/api/lessons/large-0-1/'):
+            etag = self.client.get(url)['ETag']
+            bump_content_version()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertNotEqual(response['ETag'], etag)
+
+    def test_progress_change_changes_the_etag(self):
+        etag = self.client.get('/api/courses/large/')['ETag']
+        UserLessonProgress.objects.create(user=self.user, lesson=Lesson.objects.get(slug='large-0-1'), is_completed=True)
+        self.assertEqual(self.client.get('/api/courses/large/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ProgressMirrorTests(CourseAPITestCase):
+    def complete(self, slug):
+        return UserLessonProgress.objects.create(user=self.user, lesson=Lesson.objects.get(slug=slug), is_completed=True)
+
+    @override_settings(PROGRESS_BITMAP_READS=False)
+    def test_no_mirror_while_bitmap_reads_are_off(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.complete('large-0-1')
+        self.assertEqual(callbacks, [])
+        self.assertFalse(CourseProgress.objects.exists())
+
+    @override_settings(PROGRESS_BITMAP_READS=True)
+    def test_save_is_mirrored_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            progress = self.complete('large-0-1')
+        self.assertTrue(CourseProgress.objects.filter(user=self.user, course_id='large').exists())
+        self.assertTrue(ProgressBitmapStore().progress_map(self.user, ['large'])[progress.lesson_id].is_completed)
+
+    @override_settings(PROGRESS_BITMAP_READS=True)
+    def test_queryset_delete_rebuilds_once_per_course(self):
+        with mock.patch.object(ProgressBitmapStore, 'rebuild') as rebuild:
+            with self.captureOnCommitCallbacks(execute=True):
+                UserLessonProgress.objects.filter(user=self.user).delete()
+        self.assertEqual(sorted(c.args for c in rebuild.call_args_list), [(self.user.pk, 'large'), (self.user.pk, 'small')])
+
+    @override_settings(PROGRESS_BITMAP_READS=True)
+    def test_curriculum_cascade_skips_rebuilds(self):
+        with mock.patch.object(ProgressBitmapStore, 'rebuild') as rebuild:
+            with self.captureOnCommitCallbacks(execute=True):
+                Module.objects.filter(course_id='large').delete()
+        rebuild.assert_not_called()
+
+
+@override_settings(PROGRESS_BITMAP_READS=True)
+class BitmapReadTests(CourseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        call_command('rebuild_course_progress', stdout=StringIO())
+        self.other = Course.objects.create(slug='other', title_en='Other', description_en='')
+        Lesson.objects.create(module=Module.objects.create(course=self.other, title_en='M', order=1),
+                              slug='other-0-0', order=1, title_en='L')
+        bump_content_version()
+
+    def test_course_list_does_not_write_rows_for_unopened_courses(self):
+        etag = self.client.get('/api/courses/')['ETag']
+        self.assertFalse(CourseProgress.objects.filter(course=self.other).exists())
+        self.assertEqual(self.client.get('/api/courses/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_unopened_course_reads_as_no_progress(self):
+        course = self.client.get('/api/courses/other/').json()
+        lesson = course['modules'][0]['lessons'][0]
+        self.assertEqual((lesson['is_completed'], lesson['is_unlocked']), (False, True))
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    def test_matches_drf_output(self):
+        data = {
+            'text': 'Привет\u2028line\u2029para "quoted" \\ </script>',
+            'created_at': datetime(2026, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc),
+            'nested': [{'n': 1, 'f': 0.5, 'ok': True, 'none': None}],
+            1: 'int key',
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_line_separators_are_escaped(self):
+        self.assertEqual(FastJSONRenderer().render({'t': 'a\u2028b\u2029c'}), b'{"t":"a\\u2028b\\u2029c"}')
+
+
+class ModelHealthTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('mentor.services.model_health.time.monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.health = ModelHealth(failure_threshold=2, cooldown=30, max_cooldown=100)
+
+    def trip(self):
+        self.health.record_failure('m', FakeAPIError(429, 'Resource has been exhausted'))
+
+    def test_consecutive_server_errors_open_the_breaker(self):
+        self.health.record_failure('m', FakeAPIError(500, 'Internal'))
+        self.assertTrue(self.health.acquire('m'))
+        self.health.record_failure('m', FakeAPIError(503, 'Unavailable'))
+        self.assertFalse(self.health.acquire('m'))
+
+    def test_client_side_errors_do_not_count(self):
+        for error in (ValueError('bad prompt'), FakeAPIError(400, 'Invalid argument'), TimeoutError()):
+            self.health.record_failure('m', error, deadline_bound=True)
+            self.health.record_failure('m', error, deadline_bound=True)
+        self.assertNotIn('open', self.health.snapshot().values())
+        self.assertTrue(self.health.acquire('m'))
+
+    def test_full_length_timeouts_count(self):
+        self.health.record_failure('m', TimeoutError())
+        self.health.record_failure('m', FakeAPIError(504, 'Deadline Exceeded'))
+        self.assertEqual(self.health.snapshot(), {'m': 'open'})
+
+    def test_half_open_grants_a_single_probe(self):
+        self.trip()
+        self.now += 30
+        self.assertEqual(self.health.snapshot(), {'m': 'half-open'})
+        self.assertTrue(self.health.acquire('m'))
+        self.assertFalse(self.health.acquire('m'))
+
+    def test_probe_success_closes_the_breaker(self):
+        self.trip()
+        self.now += 30
+        self.health.acquire('m')
+        self.health.record_success('m')
+        self.assertEqual(self.health.snapshot(), {'m': 'closed'})
+        self.assertTrue(self.health.acquire('m'))
+
+    def test_probe_failure_reopens_with_a_longer_cooldown(self):
+        self.trip()
+        self.now += 30
+        self.health.acquire('m')
+        self.health.record_failure('m', FakeAPIError(500, 'Internal'))
+        self.now += 59
+        self.assertFalse(self.health.acquire('m'))
+        self.now += 1
+        self.assertTrue(self.health.acquire('m'))
+
+    def test_probe_ended_by_the_caller_frees_the_slot(self):
+        self.trip()
+        self.now += 30
+        self.health.acquire('m')
+        self.health.record_failure('m', TimeoutError(), deadline_bound=True)
+        self.assertTrue(self.health.acquire('m'))
+
+    def test_abandoned_probe_is_retried_after_one_cooldown(self):
+        self.trip()
+        self.now += 30
+        self.health.acquire('m')
+        self.now += 29
+        self.assertFalse(self.health.acquire('m'))
+        self.now += 1
+        self.assertTrue(self.health.acquire('m'))
+
+
+@override_settings(JOBS_INLINE=False, JOBS_VISIBILITY_TIMEOUT=60, JOBS_RETRY_BACKOFF=10)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        handlers = mock.patch.dict(jobs.HANDLERS, {'echo': self.echo, 'boom': self.boom})
+        handlers.start()
+        self.addCleanup(handlers.stop)
+
+    def echo(self, payload):
+        self.calls.append(payload)
+        return {'echo': payload['n']}
+
+    def boom(self, payload):
+        raise RuntimeError('upstream down')
+
+    def test_dedupe_key_returns_the_existing_job(self):
+        first = jobs.enqueue('echo', {'n': 1}, dedupe_key='k')
+        second = jobs.enqueue('echo', {'n': 2}, dedupe_key='k')
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_claimed_job_is_hidden_from_other_workers(self):
+        job = jobs.enqueue('echo', {'n': 1})
+        claimed = jobs.claim_next('a')
+        self.assertEqual(claimed.id, job.id)
+        self.assertEqual((claimed.status, claimed.attempts, claimed.locked_by), ('running', 1, 'a'))
+        self.assertIsNone(jobs.claim_next('b'))
+
+    def test_run_stores_the_result(self):
+        job = jobs.enqueue('echo', {'n': 7})
+        self.assertTrue(jobs.run(jobs.claim_next('a')))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result, job.locked_until), ('done', {'echo': 7}, None))
+
+    def test_expired_visibility_timeout_lets_another_worker_reclaim(self):
+        job = jobs.enqueue('echo', {'n': 1})
+        jobs.claim_next('a')
+        Job.objects.filter(id=job.id).update(locked_until=timezone.now() - timedelta(seconds=1))
+        reclaimed = jobs.claim_next('b')
+        self.assertEqual((reclaimed.id, reclaimed.locked_by, reclaimed.attempts), (job.id, 'b', 2))
+
+    def test_stale_worker_cannot_overwrite_a_newer_claim(self):
+        job = jobs.enqueue('echo', {'n': 1})
+        stale = jobs.claim_next('a')
+        Job.objects.filter(id=job.id).update(locked_until=timezone.now() - timedelta(seconds=1))
+        jobs.claim_next('b')
+        jobs.run(stale)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by), ('running', 'b'))
+
+    def test_visibility_timeout_on_last_attempt_fails_the_job(self):
+        job = jobs.enqueue('echo', {'n': 1}, max_attempts=1)
+        jobs.claim_next('a')
+        Job.objects.filter(id=job.id).update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertIsNone(jobs.claim_next('b'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+
+    def test_failure_is_retried_with_exponential_backoff(self):
+        job = jobs.enqueue('boom', {}, max_attempts=3)
+        before = timezone.now()
+        self.assertFalse(jobs.run(jobs.claim_next('a')))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertGreaterEqual(job.run_after, before + timedelta(seconds=10))
+        self.assertIsNone(jobs.claim_next('a'))  # Not due yet
+
+        Job.objects.filter(id=job.id).update(run_after=timezone.now())
+        jobs.run(jobs.claim_next('a'))
+        job.refresh_from_db()
+        self.assertGreaterEqual(job.run_after, timezone.now() + timedelta(seconds=19))
+
+    def test_last_failed_attempt_fails_the_job(self):
+        job = jobs.enqueue('boom', {}, max_attempts=1)
+        jobs.run(jobs.claim_next('a'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('upstream down', job.error)
+
+    def test_unknown_kind_fails_without_retry(self):
+        job = jobs.enqueue('missing', {})
+        jobs.run(jobs.claim_next('a'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 1))
+
+    def test_work_once_drains_due_jobs(self):
+        jobs.enqueue('echo', {'n': 1})
+        jobs.enqueue('echo', {'n': 2})
+        self.assertEqual(jobs.work('a', once=True), 2)
+        self.assertEqual([c['n'] for c in self.calls], [1, 2])
+
+    def test_worker_survives_database_errors(self):
+        class StopWorker(BaseException):
+            pass
+
+        jobs.enqueue('echo', {'n': 1})
+        claim_next = jobs.claim_next
+        errors = [OperationalError('server closed the connection unexpectedly')] * 2
+
+        def flaky_claim(worker_id):
+            if errors:
+                raise errors.pop()
+            return claim_next(worker_id)
+
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            if len(sleeps) == 3:
+                raise StopWorker
+
+        with mock.patch.object(jobs, 'claim_next', flaky_claim), mock.patch.object(jobs.time, 'sleep', sleep), \
+                mock.patch.object(jobs, 'close_old_connections') as close_old_connections:
+            with self.assertRaises(StopWorker):
+                jobs.work('a', poll_interval=2.0)
+        self.assertEqual(self.calls, [{'n': 1}])
+        self.assertEqual(sleeps, [2.0, 4.0, 2.0])  # Doubling error backoff, then back to idle polling
+        self.assertEqual(close_old_connections.call_count, 4)  # Once per loop
+
+    @override_settings(JOBS_INLINE=True)
+    def test_inline_mode_runs_in_the_caller(self):
+        job = jobs.enqueue('echo', {'n': 3})
+        self.assertEqual((job.status, job.result), ('done', {'echo': 3}))
+
+
+class TestFollowupJobTests(TestCase):
+    def test_feedback_and_homework_share_one_deadline(self):
+        user = get_user_model().objects.create_user(username='student', password='pw')
+        result = TestResult.objects.create(user=user, language='python', score=3, total_questions=5, level='junior')
+        ai = mock.Mock()
+        ai.get_feedback.return_value = 'Good job'
+        ai.generate_homework.return_value = ['Write a loop']
+
+        with mock.patch.object(job_handlers, 'get_gemini_service', return_value=ai):
+            job_handlers.test_followup({'test_result_id': result.id, 'wrong_concepts': ['loops']})
+
+        feedback_deadline = ai.get_feedback.call_args.kwargs['deadline']
+        self.assertIsInstance(feedback_deadline, Deadline)
+        self.assertIs(ai.generate_homework.call_args.kwargs['deadline'], feedback_deadline)
+        result.refresh_from_db()
+        self.assertEqual((result.ai_feedback, result.tasks), ('Good job', ['Write a loop']))
+        self.assertTrue(Homework.objects.filter(user=user, task_description='Write a loop').exists())
+
+
+@override_settings(JOBS_INLINE=False, CHAT_HISTORY_TURNS=4, CHAT_SUMMARY_EVERY=2)
+class SummarizeChatJobTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(username='student', password='pw')
+        self.session = ChatSession.objects.create(user=user, summary='Old summary')
+        self.messages = [
+            ChatMessage.objects.create(session=self.session, role='user' if i % 2 == 0 else 'mentor', content=f'm{i}')
+            for i in range(7)
+        ]
+        self.ai = mock.Mock()
+        patcher = mock.patch.object(job_handlers, 'get_gemini_service', return_value=self.ai)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_folds_all_but_the_recent_turns(self):
+        self.ai.summarize_chat.return_value = 'New summary'
+        self.assertEqual(job_handlers.summarize_chat({'session_id': self.session.id}), {'folded': 3})
+        folded = self.ai.summarize_chat.call_args[0][1]
+        self.assertEqual([m['content'] for m in folded], ['m0', 'm1', 'm2'])
+        self.session.refresh_from_db()
+        self.assertEqual((self.session.summary, self.session.summarized_until), ('New summary', self.messages[2].id))
+
+    def test_failed_summary_is_retried_and_keeps_the_old_one(self):
+        self.ai.summarize_chat.return_value = None
+        job = jobs.enqueue('summarize_chat', {'session_id': self.session.id})
+        jobs.run(jobs.claim_next('a'))
+        job.refresh_from_db()
+        self.session.refresh_from_db()
+        self.assertEqual((job.status, self.session.summary, self.session.summarized_until), ('queued', 'Old summary', 0))
+
+    def test_worker_picks_up_queued_summaries(self):
+        self.ai.summarize_chat.return_value = 'New summary'
+        jobs.enqueue('summarize_chat', {'session_id': self.session.id})
+        self.assertEqual(jobs.work('a', once=True), 1)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.summary, 'New summary')
+
+
+class DynamicQuestionViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(username='student', password='pw'))
+        self.ai = mock.Mock()
+        patcher = mock.patch('mentor.services.ai_service.get_gemini_service', return_value=self.ai)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_generates_through_the_service_at_normal_priority(self):
+        self.ai.generate_questions.return_value = [{'text_en': 'Q1'}, {'text_en': 'Q2'}]
+        response = self.client.get('/api/dynamic-questions/?language=python&category=basics')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([q['id'] for q in response.json()], ['temp_1', 'temp_2'])
+        self.ai.generate_questions.assert_called_once_with('python', 'basics', priority='normal')
+
+    def test_exhausted_quota_is_a_retryable_503(self):
+        self.ai.generate_questions.side_effect = DeadlineExceeded('Rate limit wait of 40.0s exceeds the deadline')
+        response = self.client.get('/api/dynamic-questions/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '30')
+
+
+class TestQuestionsViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user(username='student', password='pw'))
+        self.ai = mock.Mock()
+        patcher = mock.patch('mentor.services.ai_service.get_gemini_service', return_value=self.ai)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def add_questions(self, count):
+        for i in range(count):
+            TestQuestion.objects.create(
+                language='go', category='basics', text_en=f'Q{i}', text_ru=f'В{i}',
+                options_en=['a', 'b'], options_ru=['а', 'б'], correct_option=0, difficulty='junior'
+            )
+
+    def generated_priority(self):
+        return self.ai.generate_and_save_questions.call_args.kwargs['priority']
+
+    def test_empty_pool_is_filled_at_normal_priority(self):
+        self.client.get('/api/questions/?language=go&category=basics')
+        self.assertEqual(self.generated_priority(), 'normal')
+
+    def test_partial_pool_is_topped_up_as_bulk(self):
+        self.add_questions(3)
+        response = self.client.get('/api/questions/?language=go&category=basics')
+        self.assertEqual(self.generated_priority(), 'bulk')
+        self.assertEqual(len(response.json()), 3)
+
+
+class RateLimiterTests(TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('mentor.services.rate_limit.time.time', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.bucket = DBBucket(per_minute=60, burst=10)
+        self.limiter = RateLimiter(self.bucket)
+
+    def tokens(self):
+        return RateBucket.objects.get(name='gemini').tokens
+
+    def test_first_take_creates_a_full_bucket(self):
+        self.assertEqual(self.bucket.take(0), 0)
+        self.assertEqual(self.tokens(), 9)
+
+    def test_refill_is_capped_at_burst(self):
+        for _ in range(10):
+            self.bucket.take(0)
+        self.assertGreater(self.bucket.take(0), 0)
+        self.now += 3
+        self.assertEqual(self.bucket.take(0), 0)
+        self.assertEqual(self.tokens(), 2)
+        self.now += 600
+        self.bucket.take(0)
+        self.assertEqual(self.tokens(), 9)
+
+    def test_lost_compare_and_swap_rereads_the_row(self):
+        self.bucket.take(0)
+        decide = self.bucket._decide
+
+        def concurrent_take(tokens, floor):
+            # Another worker takes a token between our read and our write
+            if not concurrent_take.done:
+                concurrent_take.done = True
+                RateBucket.objects.filter(name='gemini').update(tokens=8, version=5)
+            return decide(tokens, floor)
+        concurrent_take.done = False
+
+        with mock.patch.object(self.bucket, '_decide', concurrent_take):
+            self.assertEqual(self.bucket.take(0), 0)
+        row = RateBucket.objects.get(name='gemini')
+        self.assertEqual((row.tokens, row.version), (7, 6))
+
+    def test_database_errors_let_the_call_through(self):
+        locked = OperationalError('database table is locked: mentor_ratebucket')
+        with mock.patch.object(RateBucket.objects, 'filter', side_effect=locked):
+            self.assertEqual(self.bucket.take(0), 0.0)
+            self.limiter.acquire('bulk')
+
+    def test_priority_floors_keep_tokens_for_interactive_calls(self):
+        for _ in range(5):
+            self.limiter.acquire('bulk')
+        with self.assertRaises(RateLimited):
+            self.limiter.acquire('bulk')
+        for _ in range(3):
+            self.limiter.acquire('normal')
+        with self.assertRaises(DeadlineExceeded):
+            self.limiter.acquire('normal', Deadline(0.5))
+        for _ in range(2):
+            self.limiter.acquire('interactive')
+        self.assertEqual(self.tokens(), 0)
+
+    def test_shed_bulk_call_leaves_the_bucket_untouched(self):
+        for _ in range(5):
+            self.limiter.acquire('bulk')
+        with self.assertRaises(RateLimited):
+            self.limiter.acquire('bulk')
+        self.assertEqual(self.tokens(), 5)
+
+    def test_waiting_call_gets_a_token_once_refilled(self):
+        for _ in range(10):
+            self.limiter.acquire('interactive')
+
+        def sleep(seconds):
+            self.now += seconds
+        with mock.patch('mentor.services.rate_limit.time.sleep', sleep):
+            self.limiter.acquire('interactive', Deadline(30))
+        self.assertEqual(self.now, 1001.0)
+
+
+class ProbeReleaseTests(SimpleTestCase):
+    """A half-open probe granted by the breaker is given back when the rate limiter refuses the call."""
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('mentor.services.model_health.time.monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.health = ModelHealth(failure_threshold=3, cooldown=30, max_cooldown=100)
+        patcher = mock.patch('mentor.services.ai_service.model_health', self.health)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.ai = GeminiService()
+        self.ai.api_key = 'test'
+        self.ai.cache = None
+        self.ai.rate_limiter = mock.Mock()
+        self.ai.rate_limiter.acquire.side_effect = RateLimited('Rate limit reached; bulk call shed')
+        self.ai.rate_limiter.aacquire = mock.AsyncMock(side_effect=RateLimited('Rate limit reached; bulk call shed'))
+
+        self.model = FALLBACK_MODELS[0]
+        for other in FALLBACK_MODELS[1:]:
+            self.health.record_failure(other, FakeAPIError(429, 'Quota'))
+        self.health.record_failure(self.model, FakeAPIError(429, 'Quota'))
+        self.now += 30  # Every model is half-open
+
+    def test_sync_call_releases_the_probe(self):
+        with self.assertRaises(RateLimited):
+            self.ai._generate_with_fallback('prompt', deadline=Deadline(30), priority='bulk')
+        self.assertTrue(self.health.acquire(self.model))
+
+    def test_async_call_releases_the_probe(self):
+        with self.assertRaises(RateLimited):
+            async_to_sync(self.ai._agenerate_with_fallback)('prompt', deadline=Deadline(30), priority='bulk')
+        self.assertTrue(self.health.acquire(self.model))
+
+    def open_chat_model(self):
+        self.ai.rate_limiter = None
+        self.health.record_failure(CHAT_MODEL, FakeAPIError(429, 'Quota'))
+        self.now += 30
+
+    def test_chat_setup_error_releases_the_probe(self):
+        self.open_chat_model()
+        with mock.patch.object(self.ai, 'get_model', side_effect=ValueError('unknown model')):
+            self.ai.mentor_chat([], 'hi', {}, deadline=Deadline(30))
+            async_to_sync(self.ai.amentor_chat)([], 'hi', {}, deadline=Deadline(30))
+        self.assertTrue(self.health.acquire(CHAT_MODEL))
+
+    def test_closed_chat_stream_releases_the_probe(self):
+        self.open_chat_model()
+
+        async def chunks():
+            yield fake_gemini.FakeResponse('Hello ')
+            yield fake_gemini.FakeResponse('there')
+
+        chat = mock.Mock()
+        chat.send_message_async = mock.AsyncMock(return_value=chunks())
+
+        async def read_one_chunk():
+            stream = self.ai.astream_mentor_chat([], 'hi', {}, deadline=Deadline(30))
+            first = await stream.__anext__()
+            await stream.aclose()
+            return first
+
+        with mock.patch.object(self.ai, 'get_model', return_value=mock.Mock(start_chat=mock.Mock(return_value=chat))):
+            self.assertEqual(async_to_sync(read_one_chunk)(), 'Hello ')
+        self.assertTrue(self.health.acquire(CHAT_MODEL))
+
+    def test_deadline_spent_waiting_releases_the_probe(self):
+        self.ai.rate_limiter.acquire.side_effect = DeadlineExceeded('Rate limit wait exceeds the deadline')
+        with self.assertRaises(DeadlineExceeded):
+            self.ai._generate_with_fallback('prompt', deadline=Deadline(30), priority='normal')
+        self.assertTrue(self.health.acquire(self.model))
+
+
+def parse_sse(body):
+    """[(event, data)] from a text/event-stream body."""
+    events = []
+    for frame in body.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in frame.split('\n'))
+        events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+@override_settings(
+    AI_BACKEND='fake', AI_FAKE_LATENCY='fixed:0', AI_FAKE_CHUNK_LATENCY=0, AI_FAKE_CHUNK_WORDS=2,
+    AI_FAKE_ERROR_429=0, AI_FAKE_ERROR_500=0, AI_RATE_LIMIT_BACKEND='none', AI_CACHE_BACKEND='none',
+)
+class MentorChatStreamTests(TestCase):
+    """SSE chat replies against the offline Gemini stand-in."""
+
+    def setUp(self):
+        fake_gemini._simulator = None
+        self.addCleanup(setattr, fake_gemini, '_simulator', None)
+        with mock.patch.object(ai_service, 'genai', fake_gemini):
+            self.ai = GeminiService()
+        patchers = [
+            mock.patch.object(ai_service, 'genai', fake_gemini),
+            mock.patch.object(ai_service, 'model_health', ModelHealth(3, 30, 100)),
+            mock.patch.object(views, 'get_gemini_service', lambda: self.ai),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.user = get_user_model().objects.create_user(username='student', password='pw')
+        self.auth = {'Authorization': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+
+    async def stream_body(self, response):
+        return b''.join([chunk async for chunk in response.streaming_content]).decode()
+
+    async def test_stream_is_framed_as_start_tokens_done(self):
+        response = await AsyncClient().post('/api/mentor/chat/?stream=1', {'message': 'How do loops work?'},
+                                            content_type='application/json', headers=self.auth)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = parse_sse(await self.stream_body(response))
+
+        names = [name for name, _ in events]
+        self.assertEqual(names[0], 'start')
+        self.assertEqual(names[-1], 'done')
+        self.assertGreater(names.count('token'), 1)
+        self.assertEqual(set(names[1:-1]), {'token'})
+
+        reply = ''.join(data['text'] for name, data in events if name == 'token')
+        self.assertEqual(events[-1][1]['response'], reply)
+        saved = [m async for m in ChatMessage.objects.order_by('id').values_list('role', 'content')]
+        self.assertEqual(saved, [('user', 'How do loops work?'), ('mentor', reply)])
+
+    async def test_client_disconnect_keeps_the_partial_reply(self):
+        session = await ChatSession.objects.acreate(user=self.user)
+
+        async def chunks():
+            yield 'First part, '
+            yield 'second part'
+            yield 'never sent'
+
+        stream = views.MentorChatView()._event_stream(session, chunks())
+        received = [await stream.__anext__() for _ in range(3)]  # start + two tokens
+        await stream.aclose()
+
+        self.assertEqual([name for name, _ in parse_sse(''.join(received))], ['start', 'token', 'token'])
+        saved = [m async for m in session.messages.values_list('role', 'content')]
+        self.assertEqual(saved, [('mentor', 'First part, second part')])
+
+
+class ChatHistoryTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='student', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.session = ChatSession.objects.create(user=self.user)
+        self.ids = [
+            ChatMessage.objects.create(session=self.session, role='user', content=f'm{i}').id for i in range(7)
+        ]
+        # Same timestamp for all: ordering and cursors must fall back to the id
+        ChatMessage.objects.filter(session=self.session).update(created_at=timezone.now())
+
+    def page(self, query=''):
+        response = self.client.get(f'/api/mentor/chat/{query}')
+        return response, [m['content'] for m in response.json()] if response.status_code == 200 else None
+
+    def test_latest_page_links_back(self):
+        response, contents = self.page('?limit=3')
+        self.assertEqual(contents, ['m4', 'm5', 'm6'])
+        self.assertIn(f'before={self.ids[4]}', response['Link'])
+        self.assertIn('rel="prev"', response['Link'])
+
+    def test_before_excludes_the_cursor_and_stops_at_the_start(self):
+        response, contents = self.page(f'?limit=3&before={self.ids[4]}')
+        self.assertEqual(contents, ['m1', 'm2', 'm3'])
+        self.assertIn(f'before={self.ids[1]}', response['Link'])
+
+        response, contents = self.page(f'?limit=3&before={self.ids[1]}')
+        self.assertEqual(contents, ['m0'])
+        self.assertNotIn('Link', response)
+
+    def test_since_returns_newer_messages_oldest_first(self):
+        response, contents = self.page(f'?limit=2&since={self.ids[2]}')
+        self.assertEqual(contents, ['m3', 'm4'])
+        self.assertIn(f'since={self.ids[4]}', response['Link'])
+        self.assertIn('rel="next"', response['Link'])
+
+        response, contents = self.page(f'?since={self.ids[6]}')
+        self.assertEqual(contents, [])
+        self.assertNotIn('Link', response)
+
+    def test_bad_cursors_are_rejected(self):
+        self.assertEqual(self.page('?before=999999')[0].status_code, 400)
+        self.assertEqual(self.page('?before=abc')[0].status_code, 400)
+        self.assertEqual(self.page('?limit=0')[0].status_code, 400)
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import AnalyzeView, RoadmapView, ProjectView, TestQuestionsView, SubmitTestView, UserProgressView, HomeworkView, DynamicQuestionView, CourseViewSet, LessonViewSet, CompleteLessonView, MentorChatView, GenerateReportView
+from .views import AnalyzeView, RoadmapView, ProjectView, TestQuestionsView, SubmitTestView, UserProgressView, HomeworkView, DynamicQuestionView, CourseViewSet, LessonViewSet, CompleteLessonView, MentorChatView, GenerateReportView, LessonHintView, LessonExplainView, JobStatusView
 
 router = DefaultRouter()
 router.register(r'courses', CourseViewSet)
@@ -12,7 +12,10 @@ urlpatterns = [
     path('projects/', ProjectView.as_view(), name='projects'),
     path('questions/', TestQuestionsView.as_view(), name='questions'),
     path('submit-test/', SubmitTestView.as_view(), name='submit-test'),
+    path('jobs/<int:job_id>/', JobStatusView.as_view(), name='job-status'),
     path('lessons/complete/', CompleteLessonView.as_view(), name='complete-lesson'),
+    path('lessons/<slug:slug>/hint/', LessonHintView.as_view(), name='lesson-hint'),
+    path('lessons/<slug:slug>/explain/', LessonExplainView.as_view(), name='lesson-explain'),
     path('mentor/chat/', MentorChatView.as_view(), name='mentor-chat'),
     path('courses/generate-report/', GenerateReportView.as_view(), name='generate-report'),
     path('progress/', UserProgressView.as_view(), name='progress'),
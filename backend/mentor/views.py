@@ -1,13 +1,60 @@
 from rest_framework import views, generics, permissions, status
 from rest_framework.response import Response
-from .models import Submission, AnalysisResult, Roadmap, ProjectRecommendation, TestQuestion, TestResult, UserProgress, Homework, Course, Module, Lesson, UserLessonProgress, ChatSession, ChatMessage, CourseReport
+from .models import Submission, AnalysisResult, Roadmap, ProjectRecommendation, TestQuestion, TestResult, UserProgress, Homework, Course, Lesson, UserLessonProgress, ChatSession, ChatMessage, CourseReport, Job
 from .serializers import (
     SubmissionSerializer, RoadmapSerializer, ProjectRecommendationSerializer,
     TestQuestionSerializer, TestResultSerializer, CourseSerializer, LessonDetailSerializer, UserLessonProgressSerializer
 )
 from rest_framework import viewsets, mixins
 from rest_framework.decorators import action
-from .services.ai_service import GeminiService
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from .services.ai_service import get_gemini_service
+from .async_api import AsyncAPIView
+from .renderers import EventStreamRenderer, sse_event
+from .services.course_tree import CourseTreeLoader, course_skeletons, lesson_details
+from .services.unlock import UnlockEngine, unlock_next_lesson
+from .services.content_version import content_etag, progress_revision
+from .services.language import resolve_lang, resolve_content_format, foreign_fields
+from .services.lesson_index import get_lesson_index
+from .services.jobs import enqueue
+from .services.fanout import afan_out
+from .services.deadline import Deadline, DeadlineExceeded, TimedOut, or_fallback
+from .services.model_health import NoHealthyModel
+from .services.rate_limit import RateLimited
+from .services.singleflight import singleflight
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+
+def course_etag(request, slug=None, **kwargs):
+    return content_etag(request, 'course', request.path, resolve_lang(request), course_slug=slug)
+
+def lesson_view_state(request, slug):
+    # Cached lesson payload + the user's progress rows for its course, loaded once per request
+    if not hasattr(request, '_lesson_view_state'):
+        entry = lesson_details.get(slug, resolve_lang(request), resolve_content_format(request))
+        progress = CourseTreeLoader(request.user).progress_map([entry.course_id]) if entry else {}
+        request._lesson_view_state = (entry, progress)
+    return request._lesson_view_state
+
+def lesson_etag(request, slug=None, **kwargs):
+    entry, progress = lesson_view_state(request, slug)
+    if entry is None:
+        return None
+    revision = progress_revision(request.user, rows=progress.values())
+    return content_etag(request, 'lesson', slug, resolve_lang(request), revision=revision)
+
+def revalidate(response):
+    # Let clients keep the body and revalidate with If-None-Match every time
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 class CourseViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Course.objects.all()
@@ -15,22 +62,60 @@ class CourseViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [permissions.AllowAny]
     lookup_field = 'slug'
 
-    def get_serializer_context(self):
-        ctx = super().get_serializer_context()
-        ctx['user'] = self.request.user
-        return ctx
+    def _skeleton(self, slug=None):
+        skeleton = course_skeletons.get(slug, resolve_lang(self.request))
+        if skeleton is None:
+            raise Http404
+        return skeleton
+
+    # Course trees are served from the shared skeleton cache with the user's flags merged in
+    @method_decorator(condition(etag_func=course_etag))
+    def list(self, request, *args, **kwargs):
+        courses = CourseTreeLoader(request.user).overlay(self._skeleton())
+        return revalidate(Response(courses))
+
+    @method_decorator(condition(etag_func=course_etag))
+    def retrieve(self, request, slug=None, *args, **kwargs):
+        course = CourseTreeLoader(request.user).overlay([self._skeleton(slug)])[0]
+        return revalidate(Response(course))
+
+    @action(detail=True, methods=['get'])
+    @method_decorator(condition(etag_func=course_etag))
+    def progress(self, request, slug=None):
+        """Per-user overlay only, for clients that keep the course skeleton locally."""
+        lessons = CourseTreeLoader(request.user).progress(self._skeleton(slug))
+        return revalidate(Response({"course": slug, "lessons": lessons}))
 
 class LessonViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Lesson.objects.all()
+    queryset = Lesson.objects.select_related('module__course')
     serializer_class = LessonDetailSerializer
     permission_classes = [permissions.IsAuthenticated]
     lookup_field = 'slug'
 
+    def get_queryset(self):
+        # ?lang=en|ru: skip loading the other language's columns
+        return self.queryset.defer(*foreign_fields(Lesson, resolve_lang(self.request)))
+
     def get_serializer_context(self):
         ctx = super().get_serializer_context()
         ctx['user'] = self.request.user
+        ctx['lang'] = resolve_lang(self.request)
+        ctx['content_format'] = resolve_content_format(self.request)
         return ctx
 
+    # Lesson content comes from the per-version cache; only the user's flags are computed here
+    @method_decorator(condition(etag_func=lesson_etag))
+    def retrieve(self, request, slug=None, *args, **kwargs):
+        entry, progress = lesson_view_state(request, slug)
+        if entry is None:
+            raise Http404
+        state = UnlockEngine(entry.course_lesson_ids, progress).state(entry.payload['id'])
+        return revalidate(Response({
+            **entry.payload,
+            'is_completed': state.is_completed,
+            'is_unlocked': state.is_unlocked,
+        }))
+
     @action(detail=True, methods=['post'])
     def check(self, request, slug=None):
         lesson = self.get_object()
@@ -80,33 +165,28 @@ class LessonViewSet(viewsets.ReadOnlyModelViewSet):
             
             # Unlock logic remains...
             if prog.is_completed:
-                # Same unlocking logic as before
-                next_lesson = Lesson.objects.filter(module=lesson.module, order=lesson.order + 1).first()
-                if not next_lesson:
-                    next_mod = Module.objects.filter(course=lesson.module.course, order=lesson.module.order + 1).first()
-                    if next_mod:
-                        next_lesson = next_mod.lessons.first()
-                if next_lesson:
-                     next_prog, _ = UserLessonProgress.objects.get_or_create(user=request.user, lesson=next_lesson)
-                     next_prog.is_unlocked = True
-                     next_prog.save()
+                unlock_next_lesson(request.user, lesson)
         else:
             prog.failed_attempts = (prog.failed_attempts or 0) + 1
             prog.save()
 
+        index = get_lesson_index()
         return Response({
             "passed": passed,
             "feedback": feedback,
-            "failed_attempts": prog.failed_attempts
+            "failed_attempts": prog.failed_attempts,
+            "next_lesson": index.slug(index.next_id(lesson.id))
         })
 
-    @action(detail=True, methods=['post'])
-    def hint(self, request, slug=None):
-        lesson = self.get_object()
+class LessonHintView(AsyncAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    async def post(self, request, slug=None):
+        deadline = Deadline.for_method('generate_hint')
+        lesson = await aget_object_or_404(Lesson.objects.select_related('module__course'), slug=slug)
         user_code = request.data.get('code', '')
         
-        from .services.ai_service import GeminiService
-        ai = GeminiService()
+        ai = get_gemini_service()
         
         # Context: "language" might be inferred from course slug or a property
         # For now, let's assume 'python' if lesson.module.course.slug == 'backend' etc.
@@ -116,29 +196,35 @@ class LessonViewSet(viewsets.ReadOnlyModelViewSet):
         # Use content_en as task description for AI context
         task_desc = lesson.content_en 
         
-        hint_text = ai.generate_hint(lang, task_desc, user_code)
+        hint_text = await ai.agenerate_hint(
+            lang, task_desc, user_code, deadline=deadline, cursor_line=request.data.get('cursor_line')
+        )
+        hint_text = or_fallback(hint_text, "Hint failed: timed out")
         
         return Response({"hint": hint_text})
 
-    @action(detail=True, methods=['post'])
-    def explain(self, request, slug=None):
-        lesson = self.get_object()
+class LessonExplainView(AsyncAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    async def post(self, request, slug=None):
+        deadline = Deadline.for_method('explain_error')
+        lesson = await aget_object_or_404(Lesson.objects.select_related('module__course'), slug=slug)
         user_code = request.data.get('code', '')
         error_msg = request.data.get('error', 'Unknown Error')
         
-        from .services.ai_service import GeminiService
-        ai = GeminiService()
+        ai = get_gemini_service()
         course_slug = lesson.module.course.slug
         lang = 'python' if 'backend' in course_slug else 'javascript'
         task_desc = lesson.content_en 
         
-        explanation = ai.explain_error(lang, task_desc, user_code, error_msg)
+        explanation = await ai.aexplain_error(lang, task_desc, user_code, error_msg, deadline=deadline)
+        explanation = or_fallback(explanation, "Error explanation failed: timed out")
         
         return Response({"explanation": explanation})
 
 from .services.roadmap import RoadmapGenerator
 from .services.projects import ProjectGenerator
-from .services.ai_service import GeminiService
+from .services.ai_service import get_gemini_service
 import random
 
 class AnalyzeView(views.APIView):
@@ -232,10 +318,10 @@ class UserProgressView(views.APIView):
             "completed": progress.completed_categories
         })
 
-class HomeworkView(views.APIView):
+class HomeworkView(AsyncAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
-    def get(self, request):
+    async def get(self, request):
         language = request.query_params.get('language', 'python').lower()
         homeworks = Homework.objects.filter(user=request.user, language=language).order_by('-created_at')
         return Response([{
@@ -247,22 +333,34 @@ class HomeworkView(views.APIView):
             "submission": h.submission_text,
             "attempts": h.attempts,
             "correct_solution": h.correct_solution
-        } for h in homeworks])
+        } async for h in homeworks])
 
-    def post(self, request):
+    async def post(self, request):
+        deadline = Deadline.for_method('check_homework')
         hw_id = request.data.get('id')
         submission = request.data.get('submission')
         
         try:
-            hw = Homework.objects.get(id=hw_id, user=request.user)
+            hw = await Homework.objects.aget(id=hw_id, user=request.user)
             hw.submission_text = submission
             hw.attempts += 1
             hw.status = 'submitted'
-            hw.save()
+            await hw.asave()
             
             # AI Check
-            ai = GeminiService()
-            passed, feedback = ai.check_homework(hw.language, hw.task_description, submission)
+            ai = get_gemini_service()
+            verdict = await ai.acheck_homework(hw.language, hw.task_description, submission, deadline=deadline)
+            if isinstance(verdict, TimedOut):
+                # Not the student's fault: leave it submitted and don't count the attempt
+                hw.attempts -= 1
+                await hw.asave()
+                return Response({
+                    "passed": False,
+                    "feedback": "Ошибка проверки: превышено время ожидания, попробуйте ещё раз.",
+                    "attempts": hw.attempts,
+                    "correct_solution": hw.correct_solution
+                })
+            passed, feedback = verdict
             
             if passed:
                 hw.status = 'passed'
@@ -273,11 +371,14 @@ class HomeworkView(views.APIView):
                 # Check for 3 failures
                 if hw.attempts >= 3:
                     # Generate official solution
-                    solution = ai.get_homework_solution(hw.language, hw.task_description)
-                    hw.correct_solution = solution
+                    solution = await ai.aget_homework_solution(
+                        hw.language, hw.task_description, deadline=Deadline.for_method('get_homework_solution')
+                    )
+                    # Left empty on a timeout, so the next failed attempt asks again
+                    hw.correct_solution = or_fallback(solution, hw.correct_solution)
                     # We might still keep status as 'failed' but the solution will be visible
             
-            hw.save()
+            await hw.asave()
             
             return Response({
                 "passed": passed,
@@ -295,31 +396,18 @@ class DynamicQuestionView(views.APIView):
         language = request.query_params.get('language', 'python').lower()
         category = request.query_params.get('category', 'basics').lower()
         
-        from .services.ai_service import GeminiService
-        import json
-        
-        ai = GeminiService()
-        prompt = f"""
-        Generate 5 multiple choice questions for {language} learners on theme '{category}'.
-        Response MUST be a JSON list of objects:
-        [
-            {{
-                "id": "temp_1",
-                "text_en": "Question text...",
-                "text_ru": "Текст вопроса...",
-                "options_en": ["A", "B", "C", "D"],
-                "options_ru": ["А", "Б", "В", "Г"],
-                "correct_option": 0
-            }}
-        ]
-        """
+        from .services.ai_service import get_gemini_service
         
+        ai = get_gemini_service()
         try:
-            response = ai.model.generate_content(prompt)
-            # Remove markdown code blocks if present
-            clean_text = response.text.strip().replace("```json", "").replace("```", "").strip()
-            questions = json.loads(clean_text)
-            return Response(questions)
+            # Same rate limit, breaker, fallback models and deadline as the other generators.
+            # A user is waiting with no pool to fall back to, so this is not sheddable bulk work.
+            questions = ai.generate_questions(language, category, priority='normal')
+            return Response([{"id": f"temp_{i}", **q} for i, q in enumerate(questions, 1)])
+        except (RateLimited, NoHealthyModel, DeadlineExceeded) as e:
+            response = Response({"error": str(e)}, status=503)
+            response['Retry-After'] = '30'
+            return response
         except Exception as e:
             return Response({"error": str(e)}, status=500)
 
@@ -344,28 +432,46 @@ class TestQuestionsView(views.APIView):
         language = request.query_params.get('language', 'python').lower()
         category = request.query_params.get('category', 'basics').lower()
         
+        lang = resolve_lang(request)
+        deferred = foreign_fields(TestQuestion, lang)
+
         # Get questions for the language and category
-        questions = TestQuestion.objects.filter(language=language, category=category)
+        questions = TestQuestion.objects.filter(language=language, category=category).defer(*deferred)
         
         # Hybrid Logic: If we have less than 10 questions, generate more using AI
-        if questions.count() < 10:
-            from .services.ai_service import GeminiService
-            ai = GeminiService()
-            needed = 10 - questions.count()
-            # Generate and save to DB
-            ai.generate_and_save_questions(language, category, count=needed)
+        pool_size = questions.count()
+        if pool_size < 10:
+            from .services.ai_service import get_gemini_service
+            ai = get_gemini_service()
+            deadline = Deadline.for_method('generate_and_save_questions')
+
+            # Filling an empty pool is what this user waits on, so it must not be shed as bulk work
+            priority = 'bulk' if pool_size else 'normal'
+
+            def top_up():
+                # Counted again under the lease: an earlier generation may have filled the pool
+                needed = 10 - TestQuestion.objects.filter(language=language, category=category).count()
+                if needed > 0:
+                    ai.generate_and_save_questions(language, category, count=needed, deadline=deadline, priority=priority)
+
+            # One generation per pool across threads and workers. Concurrent requests wait
+            # for it only when there is nothing to serve yet, otherwise take the current pool.
+            singleflight.do(
+                f'questions:{language}:{category}', top_up,
+                wait=0 if pool_size else deadline.seconds, lease_ttl=deadline.seconds + 30
+            )
             # Re-fetch after generation
-            questions = TestQuestion.objects.filter(language=language, category=category)
+            questions = TestQuestion.objects.filter(language=language, category=category).defer(*deferred)
 
         # If still no questions for this category (e.g. AI failed or newly seeded), fallback to any for that language
         if not questions.exists():
-            questions = TestQuestion.objects.filter(language=language)
+            questions = TestQuestion.objects.filter(language=language).defer(*deferred)
             
         if questions.count() > 10:
             import random
             questions = random.sample(list(questions), 10)
         
-        serializer = TestQuestionSerializer(questions, many=True)
+        serializer = TestQuestionSerializer(questions, many=True, context={'lang': lang})
         return Response(serializer.data)
 
 class SubmitTestView(views.APIView):
@@ -427,50 +533,6 @@ class SubmitTestView(views.APIView):
             elif score_percent < 90: level = 'strong_junior'
             else: level = 'middle'
 
-            # AI Feedback Integration
-            ai = None
-            ai_advice = None
-            try:
-                ai = GeminiService()
-                ai_advice = ai.get_feedback(
-                    language=language,
-                    category=category,
-                    score=correct_count,
-                    total=total,
-                    wrong_answers=wrong_concepts[:5], 
-                    is_child=is_child
-                )
-            except Exception as e:
-                print(f"AI Feedback failed: {e}")
-                ai_advice = "AI Mentor is currently offline, but great job!"
-
-            # Generate Homework Tasks (AI prioritized)
-            tasks = []
-            try:
-                # Re-init service or reuse? Reuse is fine.
-                if not ai: ai = GeminiService()
-                tasks = ai.generate_homework(language, category, wrong_concepts, is_child)
-            except Exception as e:
-                print(f"AI Homework Gen failed: {e}")
-            
-            if not tasks:
-                tasks = self._generate_tasks(language, level, is_child)
-            
-            # Create Homework objects for the user safely
-            try:
-                for task_desc in tasks:
-                    # Avoid get_or_create on TextField for safety
-                    if not Homework.objects.filter(user=request.user, language=language, category=category, task_description=task_desc).exists():
-                        Homework.objects.create(
-                            user=request.user,
-                            language=language,
-                            category=category,
-                            task_description=task_desc,
-                            status='assigned'
-                        )
-            except Exception as e:
-                print(f"Homework saving failed: {e}")
-
             # Generate/Update Roadmap & Projects (Non-critical)
             roadmap_steps = []
             projects_data = []
@@ -495,10 +557,16 @@ class SubmitTestView(views.APIView):
                 score=correct_count,
                 total_questions=total,
                 level=level,
-                ai_feedback=ai_advice,
                 roadmap=roadmap_steps,
                 projects=projects_data,
-                tasks=tasks
+            )
+
+            # AI feedback and homework run in the background (mentor/jobs.py); poll /api/jobs/<job_id>/
+            job = enqueue(
+                'test_followup',
+                {"test_result_id": result.id, "wrong_concepts": wrong_concepts, "is_child": is_child},
+                user=request.user,
+                dedupe_key=f"test_followup:{result.id}"
             )
 
             return Response({
@@ -507,13 +575,15 @@ class SubmitTestView(views.APIView):
                 "score": correct_count,
                 "total": total,
                 "percent": score_percent,
-                "ai_feedback": ai_advice,
+                "ai_feedback": (job.result or {}).get("ai_feedback"),
                 "unlocked": progress.unlocked_categories,
                 "level": level,
                 "roadmap": roadmap_steps,
                 "projects": projects_data,
-                "tasks": tasks,
-                "is_child": is_child
+                "tasks": (job.result or {}).get("tasks", []),
+                "is_child": is_child,
+                "job_id": job.id,
+                "job_status": job.status
             })
         except Exception as e:
             # Catch-all for Critical Failures (DB connection etc)
@@ -521,48 +591,22 @@ class SubmitTestView(views.APIView):
             print(traceback.format_exc())
             return Response({"error": f"Critical Error: {str(e)}"}, status=500)
 
-    def _generate_tasks(self, language, level, is_child):
-        # Basic task sets
-        all_tasks = {
-            'python': {
-                'beginner': ["Write a basic calculator", "Create a loop that prints prime numbers", "Build a guessing game", "List all files in a folder", "Calculate area of a circle"],
-                'junior': ["Build a web scraper with BeautifulSoup", "Create a simple CRUD with Flask", "Automate email sending", "Parse a CSV file", "Create a basic CLI tool"],
-                'strong_junior': ["Implement a decorator for logging", "Write unit tests for a library", "Design a simple API with Django", "Optimize a dictionary search", "Handle JSON data from an API"],
-                'middle': ["Design a microservice using FastAPI", "Optimize a slow SQL query with Django ORM", "Implement a custom caching layer", "Build a real-time notification system", "Architect a scalable backend"]
-            },
-            'javascript': {
-                'beginner': ["Create a To-Do list with vanilla JS", "Build a countdown timer", "Change background color on click", "Validate a simple form", "Create a digital clock"],
-                'junior': ["Fetch data from an API and display it", "Use localStorage to save user preferences", "Build a photo gallery", "Implement a search filter", "Create a toggle-able accordion"],
-                'strong_junior': ["Implement a custom React Hook", "Setup routing with React Router", "Build a state-managed store", "Handle async data with Redux", "Integrate a 3rd party library"],
-                'middle': ["Build a real-time chat with Socket.io", "Setup Next.js with SSR", "Optimize bundle size", "Implement advanced animations", "Architect an enterprise React app"]
-            },
-            'go': {
-                'beginner': ["Hello world with Go routines", "Write a program that reads a JPG", "Simple CLI flag parser", "Math operations", "String manipulation"],
-                'junior': ["Create a concurrent URL checker", "Build a REST API with Fiber", "Handle JSON files", "Simple TCP echo server", "File encryption tool"],
-                'middle': ["Implement a worker pool", "Design a CLI tool for file encryption", "Optimize memory usage", "Build a high-performance proxy", "Microservice communication"]
-            },
-            'java': {
-                'beginner': ["Inheritance example with Animals", "File IO basics", "Simple geometry shapes", "Calculator", "User Input handling"],
-                'junior': ["Spring Boot Hello World", "Connect to MySQL with JDBC", "Build a library manager", "HTTP Client example", "Unit testing with JUnit"],
-                'middle': ["Microservices with Spring Cloud", "JVM performance tuning basics", "Hibernate optimizations", "Multithreading systems", "Enterprise patterns"]
-            }
-        }
-        
-        lang_tasks = all_tasks.get(language, {})
-        level_tasks = lang_tasks.get(level, lang_tasks.get('junior', ["Explore the official documentation"]))
-        
-        # Enforce counts: 3 for kids, 5 for adults
-        count = 3 if is_child else 5
-        
-        # Use random.choices to allow repetitions if pool is small, preventing crashes
-        import random
-        selected = random.choices(level_tasks, k=count)
-        
-        # Add friendly icons for kids
-        if is_child:
-            return [f"🌟 {task}" for task in selected]
-        
-        return selected
+class JobStatusView(views.APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = Job.objects.filter(id=job_id, user=request.user).first()
+        if not job:
+            return Response({"error": "Job not found"}, status=404)
+        return Response({
+            "id": job.id,
+            "kind": job.kind,
+            "status": job.status,
+            "attempts": job.attempts,
+            "result": job.result,
+            "error": job.error.strip().splitlines()[-1] if job.status == 'failed' and job.error else None
+        })
+
 class CompleteLessonView(views.APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -571,7 +615,7 @@ class CompleteLessonView(views.APIView):
         if not lesson_slug:
             return Response({"error": "lesson_slug is required"}, status=400)
             
-        lesson = Lesson.objects.filter(slug=lesson_slug).first()
+        lesson = Lesson.objects.select_related('module').filter(slug=lesson_slug).first()
         if not lesson:
             return Response({"error": "Lesson not found"}, status=404)
             
@@ -583,21 +627,21 @@ class CompleteLessonView(views.APIView):
         progress.save()
         
         # Also ensure NEXT lesson is marked as unlocked in DB
-        next_lesson = Lesson.objects.filter(module=lesson.module, order=lesson.order + 1).first()
-        if next_lesson:
-            next_prog, _ = UserLessonProgress.objects.get_or_create(
-                user=request.user,
-                lesson=next_lesson
-            )
-            next_prog.is_unlocked = True
-            next_prog.save()
+        next_id = unlock_next_lesson(request.user, lesson)
             
-        return Response({"message": "Lesson completed successfully"})
+        return Response({
+            "message": "Lesson completed successfully",
+            "next_lesson": get_lesson_index().slug(next_id)
+        })
 
-class MentorChatView(views.APIView):
+class MentorChatView(AsyncAPIView):
     permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, EventStreamRenderer]
+    history_page_size = 50
+    max_history_page_size = 200
 
-    def post(self, request):
+    async def post(self, request):
+        deadline = Deadline.for_method('mentor_chat')
         user = request.user
         lesson_slug = request.data.get('lesson_slug')
         message = request.data.get('message')
@@ -608,69 +652,155 @@ class MentorChatView(views.APIView):
 
         lesson = None
         if lesson_slug:
-            lesson = Lesson.objects.filter(slug=lesson_slug).first()
+            lesson = await Lesson.objects.select_related('module__course').filter(slug=lesson_slug).afirst()
 
         # Get or create active session for this lesson
-        session, _ = ChatSession.objects.get_or_create(
+        session, _ = await ChatSession.objects.aget_or_create(
             user=user, 
             lesson=lesson, 
             is_active=True
         )
 
-        # Get last 10 messages for history
-        history_msgs = session.messages.all()[:10]
+        # History: the rolling summary plus the messages not folded into it yet (bounded by
+        # the summarize_chat job; the slice only matters while the job is behind)
+        history_msgs = session.messages.filter(id__gt=session.summarized_until).order_by('-created_at', '-id')[
+            :settings.CHAT_HISTORY_TURNS + settings.CHAT_SUMMARY_EVERY
+        ]
         history = [
             {"role": m.role, "content": m.content} 
-            for m in history_msgs
-        ]
+            async for m in history_msgs
+        ][::-1]
 
         # Save user message
-        ChatMessage.objects.create(session=session, role='user', content=message)
+        await ChatMessage.objects.acreate(session=session, role='user', content=message)
 
         # AI Mentor Context
         context_info = {
             "language": lesson.module.course.slug if lesson else "Programming",
             "lesson_title": lesson.title_en if lesson else "General Help",
             "lesson_content": lesson.content_en if lesson else "",
-            "user_code": user_code
+            "user_code": user_code,
+            "cursor_line": request.data.get('cursor_line'),
+            "conversation_summary": session.summary
         }
 
         is_child = user.age <= 14 if hasattr(user, 'age') else False
         
-        ai = GeminiService()
-        ai_response = ai.mentor_chat(history, message, context_info, is_child=is_child)
+        ai = get_gemini_service()
+
+        # Streaming mode: tokens as Server-Sent Events, mentor message saved when the stream ends
+        if request.query_params.get('stream') in ('1', 'true') or 'text/event-stream' in request.META.get('HTTP_ACCEPT', ''):
+            chunks = ai.astream_mentor_chat(history, message, context_info, is_child=is_child, deadline=deadline)
+            return StreamingHttpResponse(
+                self._event_stream(session, chunks),
+                content_type='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+
+        ai_response = await ai.amentor_chat(history, message, context_info, is_child=is_child, deadline=deadline)
+        ai_response = or_fallback(ai_response, "Chat error: timed out")
 
         # Save mentor response
-        ChatMessage.objects.create(session=session, role='mentor', content=ai_response)
+        await ChatMessage.objects.acreate(session=session, role='mentor', content=ai_response)
+        await self._fold_history(session)
 
         return Response({
             "response": ai_response,
             "session_id": session.id
         })
 
-    def get(self, request):
+    async def _event_stream(self, session, chunks):
+        parts = []
+        saved = False
+        try:
+            yield sse_event('start', {"session_id": session.id})
+            async for chunk in chunks:
+                chunk = or_fallback(chunk, "Chat error: timed out")
+                parts.append(chunk)
+                yield sse_event('token', {"text": chunk})
+            ai_response = ''.join(parts)
+            await ChatMessage.objects.acreate(session=session, role='mentor', content=ai_response)
+            saved = True
+            await self._fold_history(session)
+            yield sse_event('done', {"response": ai_response, "session_id": session.id})
+        finally:
+            # Client went away mid-answer: keep what was generated
+            if not saved and parts:
+                await ChatMessage.objects.acreate(session=session, role='mentor', content=''.join(parts))
+
+    async def _fold_history(self, session):
+        """Queues the summarize_chat job once enough unsummarized messages have piled up."""
+        pending = await session.messages.filter(id__gt=session.summarized_until).acount()
+        batches = (pending - settings.CHAT_HISTORY_TURNS) // settings.CHAT_SUMMARY_EVERY
+        if batches >= 1:
+            # One job per batch: a failed one is retried by the next batch under a new key
+            await sync_to_async(enqueue)(
+                'summarize_chat', {"session_id": session.id},
+                dedupe_key=f"summarize_chat:{session.id}:{session.summarized_until}:{batches}"
+            )
+
+    async def get(self, request):
         lesson_slug = request.query_params.get('lesson_slug')
         lesson = None
         if lesson_slug:
-            lesson = Lesson.objects.filter(slug=lesson_slug).first()
+            lesson = await Lesson.objects.filter(slug=lesson_slug).afirst()
         
-        session = ChatSession.objects.filter(user=request.user, lesson=lesson, is_active=True).first()
+        session = await ChatSession.objects.filter(user=request.user, lesson=lesson, is_active=True).afirst()
         
         if not session:
             return Response([])
-            
+
+        # Cursor pagination over message ids, oldest first within a page:
+        #   (no cursor)   the latest `limit` messages
+        #   ?before=<id>  the `limit` messages before that one (scrolling back)
+        #   ?since=<id>   up to `limit` messages after that one (polling for new ones)
+        # A Link header (rel="prev"/"next") carries the cursor for the next page when there is one.
+        params = request.query_params
+        try:
+            limit = min(int(params.get('limit', self.history_page_size)), self.max_history_page_size)
+            before, since = [int(params[k]) if params.get(k) else None for k in ('before', 'since')]
+        except ValueError:
+            return Response({"error": "limit, before and since must be integers"}, status=400)
+        if limit < 1:
+            return Response({"error": "limit must be positive"}, status=400)
+
         msgs = session.messages.all()
-        return Response([
-            {"role": m.role, "content": m.content, "created_at": m.created_at}
-            for m in msgs
+        cursor = since or before
+        if cursor:
+            anchor = await msgs.filter(id=cursor).values_list('created_at', flat=True).afirst()
+            if anchor is None:
+                return Response({"error": "Unknown cursor"}, status=400)
+            if since:
+                msgs = msgs.filter(Q(created_at__gt=anchor) | Q(created_at=anchor, id__gt=cursor))
+            else:
+                msgs = msgs.filter(Q(created_at__lt=anchor) | Q(created_at=anchor, id__lt=cursor))
+
+        if since:
+            page = [m async for m in msgs.order_by('created_at', 'id')[:limit + 1]]
+        else:
+            page = [m async for m in msgs.order_by('-created_at', '-id')[:limit + 1]]
+        has_more = len(page) > limit
+        page = page[:limit] if since else page[:limit][::-1]
+
+        response = Response([
+            {"id": m.id, "role": m.role, "content": m.content, "created_at": m.created_at}
+            for m in page
         ])
+        if has_more:
+            url = request.build_absolute_uri()
+            if since:
+                link = f'<{replace_query_param(remove_query_param(url, "before"), "since", page[-1].id)}>; rel="next"'
+            else:
+                link = f'<{replace_query_param(remove_query_param(url, "since"), "before", page[0].id)}>; rel="prev"'
+            response['Link'] = link
+        return response
 
-class GenerateReportView(views.APIView):
+class GenerateReportView(AsyncAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
-    def post(self, request):
+    async def post(self, request):
         course_slug = request.data.get('course_slug')
-        course = Course.objects.filter(slug=course_slug).first()
+        course = await Course.objects.filter(slug=course_slug).afirst()
         if not course:
             return Response({"error": "Course not found"}, status=404)
 
@@ -678,8 +808,8 @@ class GenerateReportView(views.APIView):
         user = request.user
         lesson_progress = UserLessonProgress.objects.filter(user=user, lesson__module__course=course)
         
-        completed_count = lesson_progress.filter(is_completed=True).count()
-        total_count = Lesson.objects.filter(module__course=course).count()
+        completed_count = await lesson_progress.filter(is_completed=True).acount()
+        total_count = await Lesson.objects.filter(module__course=course).acount()
         
         # Advanced Analysis for AI
         is_child = user.age <= 14 if hasattr(user, 'age') else False
@@ -687,17 +817,16 @@ class GenerateReportView(views.APIView):
         weaknesses = []
         
         # Look at modules with many failures
-        struggled_progress = lesson_progress.filter(failed_attempts__gte=2)
-        if struggled_progress.exists():
-            weaknesses = [f"{p.lesson.module.title_en}: {p.lesson.title_en}" for p in struggled_progress[:5]]
+        struggled_progress = lesson_progress.filter(failed_attempts__gte=2).select_related('lesson__module')
+        weaknesses = [f"{p.lesson.module.title_en}: {p.lesson.title_en}" async for p in struggled_progress[:5]]
         
         # Look at modules completed quickly or with 0 failures
-        strength_progress = lesson_progress.filter(is_completed=True, failed_attempts=0)
-        if strength_progress.exists():
-            strengths = [f"{p.lesson.module.title_en}" for p in strength_progress[:5]]
+        strength_progress = lesson_progress.filter(is_completed=True, failed_attempts=0).select_related('lesson__module')
+        strengths = [f"{p.lesson.module.title_en}" async for p in strength_progress[:5]]
 
         # AI Logic
-        ai = GeminiService()
+        ai = get_gemini_service()
+        deadline = Deadline.for_method('generate_final_report')
         history = [] # No chat history needed for report
         context = {
             "type": "final_report",
@@ -706,14 +835,20 @@ class GenerateReportView(views.APIView):
             "is_child": is_child,
             "strengths": ", ".join(strengths) if strengths else "Consistent progress",
             "weaknesses": ", ".join(weaknesses) if weaknesses else "Minor logic errors",
-            "modules_passed": ", ".join([m.title_en for m in course.modules.all()[:10]])
+            "modules_passed": ", ".join([m.title_en async for m in course.modules.all()[:10]])
         }
         
         # Generate Report using a specialized system prompt
-        report_en = ai.generate_final_report(context, lang='en')
-        report_ru = ai.generate_final_report(context, lang='ru')
-        
-        report_obj = CourseReport.objects.create(
+        # Both languages at once: wall time is the slower report, not the sum
+        timed_out = "Error generating report: timed out"
+        fan = await afan_out({
+            'en': ai.agenerate_final_report(context, lang='en', deadline=deadline),
+            'ru': ai.agenerate_final_report(context, lang='ru', deadline=deadline),
+        }, defaults={'en': timed_out, 'ru': timed_out})
+        report_en = or_fallback(fan.results['en'], timed_out)
+        report_ru = or_fallback(fan.results['ru'], timed_out)
+        
+        report_obj = await CourseReport.objects.acreate(
             user=user,
             course=course,
             content_en=report_en,
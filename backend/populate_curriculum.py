@@ -5,6 +5,8 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 django.setup()
 
 from mentor.models import Course, Module, Lesson
+from mentor.services.content_version import bump_content_version
+from mentor.services.markdown_render import prerender_lessons
 
 def populate():
     # 1. Create Courses
@@ -379,5 +381,9 @@ def populate():
         )
     print("Frontend population complete.")
 
+    print(f"Pre-rendered HTML for {prerender_lessons()} lessons.")
+    version = bump_content_version()
+    print(f"Content version bumped to v{version}.")
+
 if __name__ == "__main__":
     populate()
@@ -0,0 +1,97 @@
+import json
+import os
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+
+# Setup django
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from rest_framework_simplejwt.tokens import AccessToken
+
+from mentor.models import Lesson
+from users.models import User
+
+# Usage: python scripts/bench_ai_api.py [base_url] [requests] [concurrency]
+# Load-tests the AI endpoints of a running server, e.g. one started offline with
+#   AI_BACKEND=fake AI_FAKE_LATENCY=lognormal:0.8:0.5 gunicorn config.asgi:application -k uvicorn_worker.UvicornWorker
+# and reports throughput and latency percentiles (time to first byte for the stream).
+# Uses the server's database for a bench user and a lesson. Needs a populated curriculum.
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def call(url, token, body, accept='application/json'):
+    request = urllib.request.Request(url, data=json.dumps(body).encode(), method='POST', headers={
+        'Authorization': f'Bearer {token}', 'Content-Type': 'application/json', 'Accept': accept,
+    })
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=120) as response:
+            response.read(1)
+            first_byte = time.perf_counter() - start
+            response.read()
+            return response.status, first_byte, time.perf_counter() - start
+    except urllib.error.HTTPError as e:
+        return e.code, None, time.perf_counter() - start
+
+
+def run(name, fn, requests, concurrency):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda i: fn(i), range(requests)))
+    wall = time.perf_counter() - start
+
+    ok = [r for r in results if r[0] == 200]
+    totals = [r[2] for r in ok]
+    print(f"\n{name}: {len(ok)}/{requests} OK, {requests / wall:.1f} req/s")
+    if totals:
+        print(f"   total  p50 {percentile(totals, 50):6.2f}s  p95 {percentile(totals, 95):6.2f}s  "
+              f"p99 {percentile(totals, 99):6.2f}s  max {max(totals):6.2f}s")
+        first = [r[1] for r in ok]
+        print(f"   TTFB   p50 {percentile(first, 50):6.2f}s  p95 {percentile(first, 95):6.2f}s  "
+              f"p99 {percentile(first, 99):6.2f}s")
+    errors = sorted({r[0] for r in results if r[0] != 200})
+    if errors:
+        print(f"   non-200 statuses: {errors}")
+
+
+def bench(base_url='http://localhost:8000', requests=200, concurrency=20):
+    lesson = Lesson.objects.order_by('id').first()
+    if not lesson:
+        print("❌ No lessons found. Populate the curriculum first.")
+        return
+    user, _ = User.objects.get_or_create(username='ai_bench')
+    token = str(AccessToken.for_user(user))
+    api = f"{base_url.rstrip('/')}/api"
+
+    print(f"📊 {api} ({requests} requests per endpoint, concurrency {concurrency}, lesson {lesson.slug})")
+    # Distinct code per request so the hint/explain response cache does not answer for the model
+    run('hint', lambda i: call(f"{api}/lessons/{lesson.slug}/hint/", token, {"code": f"x = {i}"}),
+        requests, concurrency)
+    run('explain', lambda i: call(f"{api}/lessons/{lesson.slug}/explain/", token,
+                                  {"code": f"print(y{i})", "error": f"NameError: name 'y{i}' is not defined"}),
+        requests, concurrency)
+    run('chat', lambda i: call(f"{api}/mentor/chat/", token, {"message": f"Question {i}"}),
+        requests, concurrency)
+    run('chat (stream)', lambda i: call(f"{api}/mentor/chat/?stream=1", token, {"message": f"Question {i}"},
+                                        accept='text/event-stream'),
+        requests, concurrency)
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    bench(
+        args[0] if args else 'http://localhost:8000',
+        int(args[1]) if len(args) > 1 else 200,
+        int(args[2]) if len(args) > 2 else 20,
+    )
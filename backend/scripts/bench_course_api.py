@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+import gzip
+
+import django
+
+# Setup django
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.test import Client
+from rest_framework.renderers import JSONRenderer
+
+from mentor.middleware import BROTLI_QUALITY, brotli
+from mentor.renderers import FastJSONRenderer, orjson
+
+# Usage: python scripts/bench_course_api.py [course_slug] [iterations]
+# Compares DRF's JSONRenderer + identity encoding (before) with FastJSONRenderer
+# + brotli/gzip (after) on the course tree payload. Needs a populated database.
+
+
+def timed(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        result = fn()
+    return (time.perf_counter() - start) / iterations * 1000, result
+
+
+def bench(slug='backend', iterations=200):
+    url = f'/api/courses/{slug}/'
+    client = Client(HTTP_HOST='localhost')
+    response = client.get(url, HTTP_ACCEPT_ENCODING='identity')
+    if response.status_code != 200:
+        print(f"❌ GET {url} returned {response.status_code}. Populate the curriculum first.")
+        return
+    data = response.data
+
+    print(f"📊 {url} ({iterations} iterations)")
+    print(f"   orjson: {'yes' if orjson else 'NOT INSTALLED'}, brotli: {'yes' if brotli else 'NOT INSTALLED'}")
+
+    drf_ms, drf_body = timed(lambda: JSONRenderer().render(data), iterations)
+    fast_ms, fast_body = timed(lambda: FastJSONRenderer().render(data), iterations)
+    print("\nSerialization")
+    print(f"   before  JSONRenderer      {drf_ms:8.3f} ms  {len(drf_body):>9,} bytes")
+    print(f"   after   FastJSONRenderer  {fast_ms:8.3f} ms  {len(fast_body):>9,} bytes  ({drf_ms / fast_ms:.1f}x)")
+
+    print("\nBytes on the wire")
+    print(f"   identity                            {len(fast_body):>9,} bytes")
+    gzip_ms, gzipped = timed(lambda: gzip.compress(fast_body, compresslevel=6), 20)
+    print(f"   gzip              {gzip_ms:8.3f} ms  {len(gzipped):>9,} bytes  ({len(gzipped) / len(fast_body):.1%})")
+    if brotli:
+        br_ms, brotlied = timed(lambda: brotli.compress(fast_body, quality=BROTLI_QUALITY), 20)
+        print(f"   br (q={BROTLI_QUALITY})          {br_ms:8.3f} ms  {len(brotlied):>9,} bytes  ({len(brotlied) / len(fast_body):.1%})")
+
+    print("\nFull request (warm caches)")
+    for encoding in ('identity', 'gzip', 'br'):
+        ms, r = timed(lambda: client.get(url, HTTP_ACCEPT_ENCODING=encoding), 50)
+        print(f"   Accept-Encoding: {encoding:<9} {ms:8.3f} ms  {len(r.content):>9,} bytes  [{r.get('Content-Encoding', 'identity')}]")
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    bench(args[0] if args else 'backend', int(args[1]) if len(args) > 1 else 200)
@@ -8,6 +8,8 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 django.setup()
 
 from mentor.models import Course, Module, Lesson
+from mentor.services.content_version import bump_content_version
+from mentor.services.markdown_render import prerender_lessons
 
 def populate():
     # Only populate if Courses are empty to avoid resetting user progress periodically
@@ -102,6 +104,8 @@ def populate():
         )
 
     print(f"Successfully populated {python_course.slug} ({len(py_titles)}) and {js_course.slug} ({len(fe_titles)})!")
+    print(f"Pre-rendered HTML for {prerender_lessons()} lessons.")
+    print(f"Content version bumped to v{bump_content_version()}.")
 
 if __name__ == '__main__':
     populate()